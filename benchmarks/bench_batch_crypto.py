@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmarks for EncKeyRing batch encryption and decryption.
+
+Measures throughput of `encrypt_many` and `decrypt_many` inline and with
+thread and process pools for 1 up to the number of CPUs.
+
+    python benchmarks/bench_batch_crypto.py --count 20000 --output results.json
+
+Results are written as JSON so runs can be compared between machines.
+"""
+
+import os
+import json
+import time
+import platform
+import click
+import click_keyring
+from cryptography.fernet import Fernet
+
+
+def throughput(func, values):
+    """Return values processed per second by func(values)."""
+    start = time.perf_counter()
+    func(values)
+    return len(values) / (time.perf_counter() - start)
+
+
+def worker_counts(cpus):
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def bench_batch(kr, passwords, cpus):
+    tokens = kr.encrypt_many(passwords, workers=1)
+    results = {}
+    for pool in ("thread", "process"):
+        kr.batch_processes = pool == "process"
+        for workers in worker_counts(cpus):
+            results["{}_{}".format(pool, workers)] = {
+                "workers": workers,
+                "encrypt_per_s": throughput(
+                    lambda v: kr.encrypt_many(v, workers=workers), passwords
+                ),
+                "decrypt_per_s": throughput(
+                    lambda v: kr.decrypt_many(v, workers=workers), tokens
+                ),
+            }
+    return results
+
+
+@click.command()
+@click.option("-c", "--count", default=20000, help="Passwords per batch")
+@click.option("--cpus", type=int, help="Maximum workers. Defaults to the CPU count")
+@click.option("--output", type=click.Path(dir_okay=False), help="JSON results file")
+def main(count, cpus, output):
+    """Run the batch encryption benchmarks."""
+    cpus = cpus or os.cpu_count() or 1
+    click_keyring.EncKeyRing.key = Fernet.generate_key()
+    kr = click_keyring.EncKeyRing("bench", "username")
+    passwords = ["benchpw{}".format(i) for i in range(count)]
+
+    results = {
+        "meta": {
+            "version": click_keyring.__version__,
+            "python": platform.python_version(),
+            "count": count,
+            "cpus": cpus,
+        },
+        "batch": bench_batch(kr, passwords, cpus),
+    }
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as fh:
+            fh.write(text)
+    click.echo(text)
+
+
+if __name__ == "__main__":
+    main()
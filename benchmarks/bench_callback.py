@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the keyring_option callback hot path.
+
+Uses an in-memory keyring backend that sleeps for `--latency` seconds on each
+call to simulate the IPC cost of a real secret store.
+
+    python benchmarks/bench_callback.py --latency 0.001 --output results.json
+
+Results are written as JSON so runs can be compared between releases.
+"""
+
+import json
+import time
+import platform
+import statistics
+from collections import defaultdict
+import click
+import keyring
+import keyring.backend
+import click_keyring
+from cryptography.fernet import Fernet
+
+
+class LatencyBackEnd(keyring.backend.KeyringBackend):
+    """In-memory keyring backend adding a fixed delay to every call."""
+
+    priority = 1
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.store = defaultdict(dict)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def set_password(self, servicename, username, password):
+        self._wait()
+        self.store[servicename][username] = password
+
+    def get_password(self, servicename, username):
+        self._wait()
+        return self.store[servicename].get(username)
+
+    def delete_password(self, servicename, username):
+        self._wait()
+        self.store[servicename].pop(username, None)
+
+
+def measure(func, number):
+    """Call func `number` times and return timing stats in microseconds."""
+    timings = []
+    for _ in range(number):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return {
+        "number": number,
+        "mean_us": statistics.mean(timings),
+        "median_us": statistics.median(timings),
+        "min_us": min(timings),
+        "max_us": max(timings),
+    }
+
+
+def make_command(n_other=0, **keyring_opts):
+    """Build a command with n_other extra options used for the service name."""
+    others = tuple("opt{}".format(i) for i in range(n_other))
+
+    def cmd(**kwargs):
+        pass
+
+    for name in others:
+        cmd = click.option("--{}".format(name), default=name)(cmd)
+    cmd = click.option("--username", default="benchuser")(cmd)
+    cmd = click_keyring.keyring_option(other_options=others, **keyring_opts)(cmd)
+    return click.command(name="bench")(cmd)
+
+
+def make_context(command):
+    ctx = click.Context(command)
+    ctx.params["username"] = "benchuser"
+    return ctx
+
+
+def callback_of(command):
+    return [p for p in command.params if p.name == "password"][0].callback
+
+
+def bench_callback(number, backend, encrypt=False):
+    """
+    Time the option callback reading a saved password.
+
+    "cold" reads the backend with empty caches, "warm" is served by the
+    credential cache after one priming call. Both use the "on-change" write
+    policy so no write is timed. "uncached" and "uncached_always" read the
+    backend without the credential cache, the latter saving the password
+    again as the default "always" policy does.
+    """
+    results = {}
+    opts = {"encrypt": encrypt}
+    backend.store.clear()
+    command = make_command(**opts)
+    callback_of(command)(make_context(command), None, "benchpw")
+
+    cached_command = make_command(cache=True, write="on-change", **opts)
+    cached_callback = callback_of(cached_command)
+
+    def cold():
+        click_keyring.credential_cache.clear()
+        cached_callback(make_context(cached_command), None, None)
+
+    def warm():
+        cached_callback(make_context(cached_command), None, None)
+
+    results["cold"] = measure(cold, number)
+    warm()
+    results["warm"] = measure(warm, number)
+    for name, write in (("uncached", "on-change"), ("uncached_always", "always")):
+        command = make_command(write=write, **opts)
+        callback = callback_of(command)
+        results[name] = measure(
+            lambda: callback(make_context(command), None, None), number
+        )
+    return results
+
+
+def bench_crypto(number):
+    kr = click_keyring.EncKeyRing("bench", "username")
+    token = kr.encrypt("benchpw")
+    return {
+        "encrypt": measure(lambda: kr.encrypt("benchpw"), number),
+        "decrypt": measure(lambda: kr.decrypt(token), number),
+    }
+
+
+def bench_service_names(number):
+    results = {}
+    for n_other in (0, 5, 50):
+        command = make_command(n_other)
+        callback = callback_of(command)
+        ctx = make_context(command)
+        results["other_options_{}".format(n_other)] = measure(
+            lambda: callback.service(ctx), number
+        )
+    return results
+
+
+def bench_registration():
+    results = {}
+    for count in (1, 100, 1000):
+        start = time.perf_counter()
+        for _ in range(count):
+            make_command(encrypt=True)
+        results["commands_{}".format(count)] = {
+            "number": count,
+            "total_us": (time.perf_counter() - start) * 1e6,
+        }
+    return results
+
+
+@click.command()
+@click.option("--latency", default=0.0, help="Seconds added to each backend call")
+@click.option("-n", "--number", default=200, help="Iterations per benchmark")
+@click.option("--output", type=click.Path(dir_okay=False), help="JSON results file")
+def main(latency, number, output):
+    """Run the click_keyring benchmarks."""
+    backend = LatencyBackEnd(latency)
+    keyring.set_keyring(backend)
+    click_keyring.EncKeyRing.key = Fernet.generate_key()
+
+    results = {
+        "meta": {
+            "version": click_keyring.__version__,
+            "python": platform.python_version(),
+            "latency": latency,
+        },
+        "callback": bench_callback(number, backend),
+        "callback_encrypted": bench_callback(number, backend, encrypt=True),
+        "crypto": bench_crypto(number),
+        "service_name": bench_service_names(number),
+        "registration": bench_registration(),
+    }
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as fh:
+            fh.write(text)
+    click.echo(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,59 @@
 import os
 import re
+import time
+import weakref
+import functools
+import itertools
 import click
-import keyring
-from cryptography.fernet import Fernet
+from .cache import CredentialCache, credential_cache
+from .crypto import (
+    get_cipher,
+    parse_keys,
+    invalidate_cipher,
+    decrypt_current,
+    encrypt_many,
+    decrypt_many,
+)
+from .events import Observer, LoggingObserver, StatsObserver, null_observer
+from .filecache import FileCache
+from .completion import UsernameIndex, complete_usernames
+from .manifest import Manifest, ManifestEntry
+from .prefetch import (
+    PREFETCH_META_KEY,
+    PrefetchMixin,
+    PrefetchCommand,
+    PrefetchGroup,
+    start_lookup,
+)
+from .breaker import CircuitBreaker
+from .stores import (
+    StoreError,
+    StoreUnavailable,
+    CredentialStore,
+    KeyringStore,
+    MemoryStore,
+    SQLiteStore,
+    keyring_store,
+)
 
 __version__ = "0.2.1"
 
 
 service_name_rgx = re.compile(r"[\s.\-_]")
 
+WRITE_ALWAYS = "always"
+WRITE_ON_CHANGE = "on-change"
+WRITE_NEVER = "never"
+write_policies = (WRITE_ALWAYS, WRITE_ON_CHANGE, WRITE_NEVER)
+
+SHARED_META_KEY = "click_keyring.credentials"
+
+# get_many default for values the store could not read
+_UNREADABLE = object()
+
+# callback result placeholder while the password is still being looked up
+_PENDING = object()
+
 
 def create_service_name(*options):
     """
@@ -27,12 +72,151 @@ def create_service_name(*options):
     return "".join(str(o) for o in options)
 
 
+class ServiceNameFormatter:
+    """
+    Build keyring service names from a template, memoizing the results.
+
+    Template fields are "prefix" and the `other_options` names,
+    ex: "{prefix}/{hostname}". Without a template, the prefix and option
+    values are concatenated in the same way as `create_service_name`.
+
+    If `normalize` is True, spaces, periods, hyphens and underscores are removed
+    from the prefix and option values (not from the template) using `service_name_rgx`.
+
+    Formatted names are memoized by input so repeated values do not
+    re-run the template or the regex.
+
+    Args:
+        template (None, str): str.format template for the service name
+        normalize (bool): strip service_name_rgx characters from field values
+        maxsize (int): maximum number of memoized service names
+    """
+
+    def __init__(self, template=None, normalize=False, maxsize=4096):
+        self.template = template
+        self.normalize = normalize
+        self._format = functools.lru_cache(maxsize=maxsize)(self._build)
+
+    def __call__(self, prefix, options=()):
+        """
+        Return the service name.
+
+        Args:
+            prefix (str): service name prefix
+            options (tuple): (option name, value) pairs for the other_options
+
+        Returns:
+            name (str): formatted service name
+        """
+        return self._format(prefix, tuple(options))
+
+    def cache_info(self):
+        """Return memo cache statistics."""
+        return self._format.cache_info()
+
+    def cache_clear(self):
+        """Remove all memoized names."""
+        self._format.cache_clear()
+
+    def _clean(self, value):
+        value = str(value)
+        if self.normalize:
+            value = service_name_rgx.sub("", value)
+        return value
+
+    def _build(self, prefix, options):
+        prefix = self._clean(prefix)
+        values = [(name, self._clean(value)) for name, value in options]
+        if self.template is None:
+            return create_service_name(prefix, *(v for _, v in values))
+        return self.template.format(prefix=prefix, **dict(values))
+
+
+class OptionPlan:
+    """
+    Option name lookup table for a click command.
+
+    Built once per command and reused by every keyring option on it, so resolving
+    the username and other_options values does not scan the command params.
+
+    Args:
+        command (click.Command): command the plan is built for
+    """
+
+    def __init__(self, command):
+        self.signature = tuple(command.params)
+        self.params = {p.name: p for p in self.signature}
+        self.multiple = {
+            p.name for p in self.signature if getattr(p, "multiple", False)
+        }
+
+    def is_current(self, command):
+        """Return True if the command params have not changed since the plan was built."""
+        return self.signature == tuple(command.params)
+
+    def default(self, ctx, option):
+        """
+        Return the option default or the context default map value.
+
+        The option default takes precedence over the default map.
+        """
+        default = self.params[option].default
+        if default is None:
+            default = ctx.lookup_default(option)
+        return default
+
+
+class _Lookup:
+    """
+    State of one keyring callback invocation.
+
+    Shared by the sync and async callbacks, which only differ in how they read
+    and save passwords.
+    """
+
+    def __init__(self, shared):
+        self.shared = shared
+        self.service = None
+        self.username = None
+        self.stored = None
+        self.fetch = False
+        self.answered = False
+        # bulk invocations
+        self.combos = None
+        self.services = None
+        self.known = None
+        self.missing = None
+
+
+_option_plans = weakref.WeakKeyDictionary()
+
+
+def option_plan(command):
+    """Return the cached OptionPlan for command, rebuilding it if params changed."""
+    plan = _option_plans.get(command)
+    if plan is None or not plan.is_current(command):
+        plan = _option_plans[command] = OptionPlan(command)
+    return plan
+
+
 def keyring_option(
     *param_decls,
     prefix=None,
     user_option="username",
     other_options=None,
     encrypt=False,
+    write=WRITE_ALWAYS,
+    cache=False,
+    service_name=None,
+    max_workers=1,
+    asynchronous=False,
+    observer=None,
+    file_cache=None,
+    skip_sources=(),
+    store=None,
+    share=True,
+    username_index=None,
+    manifest=None,
     **attrs,
 ):
     """
@@ -50,6 +234,29 @@ def keyring_option(
     provided. To save passwords for each unique hostname/username combination, set the "other_options"
     argument to "('hostname',)". This assumes there is a "hostname" option defined.
 
+    The `write` argument controls when the password is saved back to the keyring:
+    - "always": save on every invocation (the default).
+    - "on-change": save only if the value differs from the one read from keyring.
+    - "never": never save, the keyring is only read.
+
+    If `cache` is True, keyring values are held in the process-wide
+    `credential_cache` so repeated invocations in the same process skip the backend.
+
+    If any of the `other_options` is defined with `multiple=True`, the option
+    resolves one password per value combination. The command then receives a dict
+    keyed by the other_options value (or a tuple of values when there are several
+    other_options) and only the missing passwords are prompted for.
+
+    If `asynchronous` is True, the callback is a coroutine for async click
+    frameworks (ex: asyncclick) and keyring calls do not block the event loop.
+
+    `service_name` customizes how the service name is built. It accepts a
+    `ServiceNameFormatter` or a template string, ex: "{prefix}/{hostname}".
+
+    If `share` is True, resolved passwords are kept in the click context `meta`
+    for the rest of the invocation. Other keyring options with the same service
+    name and username, on the group, a subcommand or a chained command, reuse
+    the password without reading or saving keyring again.
 
     Args:
         param_decls (str): short and/or long decls ex: ("-p", "--password")
@@ -59,37 +266,153 @@ def keyring_option(
         other_options (None, tuple): Additional click option names to use as part of
          the keyring service name.
         encrypt (bool): Encrypt the password in the keyring if True
+        write (str): Keyring write policy. One of "always", "on-change" or "never"
+        cache (bool): Use the process-wide credential cache in front of keyring
+        service_name (None, str, ServiceNameFormatter): Service name template or formatter
+        max_workers (int): Maximum number of threads used for batched keyring lookups
+        asynchronous (bool): Use an async callback from click_keyring.aio
+        observer (None, Observer): Receives timing and hit/miss events for this option
+        file_cache (None, bool, FileCache): Encrypted local file cache read before keyring.
+         If True, a FileCache with the default path is used.
+        skip_sources (tuple): click ParameterSource names, ex: ("ENVIRONMENT", "DEFAULT_MAP").
+         A password from one of these sources is returned without reading or saving keyring.
+        store (None, CredentialStore): Where passwords are stored. Defaults to keyring.
+        share (bool): Share resolved passwords with other keyring options in the same invocation
+        username_index (None, bool, UsernameIndex): Record usernames for `complete_usernames`.
+         If True, a UsernameIndex with the default path is used.
+        manifest (None, bool, Manifest): Record saved credentials and their other_options values.
+         If True, a Manifest with the default path is used.
          attrs (dict): Addition keyword arguments to pass to click option
 
     """
+    if write not in write_policies:
+        raise ValueError(
+            'Invalid write policy "{}". Must be one of: {}'.format(
+                write, ", ".join(write_policies)
+            )
+        )
     other_options = other_options or ()
     # Ensure other_options is an iterable of strings
     if isinstance(other_options, str):
         other_options = (other_options,)
+    if isinstance(service_name, str):
+        service_name = ServiceNameFormatter(service_name)
+    if file_cache is True:
+        file_cache = FileCache()
+    if username_index is True:
+        username_index = UsernameIndex()
+    if manifest is True:
+        manifest = Manifest()
     cls = EncKeyRing if encrypt else KeyRing
+    if asynchronous:
+        from .aio import AsyncKeyRing, AsyncEncKeyRing
+
+        cls = AsyncEncKeyRing if encrypt else AsyncKeyRing
 
     def decorator(f):
         attrs["prompt"] = False
         attrs["hide_input"] = True
         attrs.setdefault("confirmation_prompt", False)
-        attrs["callback"] = cls(prefix, user_option, other_options)
+        attrs["callback"] = cls(
+            prefix,
+            user_option,
+            other_options,
+            write=write,
+            cache=cache,
+            service_name=service_name,
+            max_workers=max_workers,
+            observer=observer,
+            file_cache=file_cache,
+            skip_sources=skip_sources,
+            store=store,
+            share=share,
+            username_index=username_index,
+            manifest=manifest,
+        )
         return click.option(*(param_decls or ("--password",)), **attrs)(f)
 
     return decorator
 
 
+def keyring_stats_option(observer, *param_decls, **attrs):
+    """
+    Add a hidden flag that prints the statistics of a StatsObserver on exit.
+
+    Args:
+        observer (StatsObserver): observer passed to the keyring options
+        param_decls (str): flag decls, defaults to ("--keyring-stats",)
+        attrs (dict): Addition keyword arguments to pass to click option
+    """
+
+    def callback(ctx, _, value):
+        if value:
+            ctx.call_on_close(lambda: click.echo(observer.report(), err=True))
+
+    attrs.setdefault("hidden", True)
+    attrs.setdefault("is_eager", True)
+    attrs.setdefault("help", "Print keyring statistics on exit.")
+    return click.option(
+        *(param_decls or ("--keyring-stats",)),
+        is_flag=True,
+        expose_value=False,
+        callback=callback,
+        **attrs,
+    )
+
+
 class KeyRing:
-    def __init__(self, prefix=None, username_option="username", other_options=None):
+    def __init__(
+        self,
+        prefix=None,
+        username_option="username",
+        other_options=None,
+        write=WRITE_ALWAYS,
+        cache=False,
+        service_name=None,
+        max_workers=1,
+        observer=None,
+        file_cache=None,
+        skip_sources=(),
+        store=None,
+        share=True,
+        username_index=None,
+        manifest=None,
+    ):
         self.prefix = prefix
         self.user_option = username_option
         self.other_options = other_options or ()
+        self.write = write
+        self.cache = cache
+        self.service_name = service_name
+        self.max_workers = max_workers
+        self.observer = observer or null_observer
+        self.file_cache = file_cache
+        self.skip_sources = {getattr(s, "name", s).upper() for s in skip_sources}
+        self.store = store or keyring_store
+        self.share = share
+        self.username_index = username_index
+        self.manifest = manifest
 
     def service(self, ctx):
         """Return keyring service name."""
         prefix = self.prefix or ctx.command.name
         others = [self._get_option_values(ctx, o) for o in self.other_options]
-        svc = create_service_name(prefix, *others)
-        return svc
+        return self.build_service(prefix, others)
+
+    def build_service(self, prefix, values):
+        """
+        Build the service name from a prefix and the other_options values.
+
+        Args:
+            prefix (str): service name prefix
+            values (list): values for each of the other_options, in order
+
+        Returns:
+            name (str): keyring service name
+        """
+        if self.service_name is None:
+            return create_service_name(prefix, *values)
+        return self.service_name(prefix, tuple(zip(self.other_options, values)))
 
     def username(self, ctx):
         return self._get_option_values(ctx, self.user_option)
@@ -110,8 +433,9 @@ class KeyRing:
         Returns:
             str: value for option
         """
+        plan = option_plan(ctx.command)
         # first, check if option is really one of the parameters (args and options)
-        if option not in [p.name for p in ctx.command.params]:
+        if option not in plan.params:
             msg = 'Option "{}" does not exist on command "{}"'.format(
                 option, ctx.command.name
             )
@@ -122,7 +446,7 @@ class KeyRing:
             return ctx.params.get(option)
 
         # look for default value if not found, raise error
-        default = self._get_option_defaults(ctx, option)
+        default = plan.default(ctx, option)
         if default is None:
             msg = '"{}" option must be provided before the password'.format(option)
             raise click.exceptions.BadOptionUsage(option, msg, ctx)
@@ -145,13 +469,7 @@ class KeyRing:
         Returns:
             default (None, str): default value for option or None
         """
-        option_idx = [o.name for o in ctx.command.get_params(ctx)].index(option)
-        default = ctx.command.get_params(ctx)[option_idx].default
-
-        if default is None:
-            default = ctx.lookup_default(option)
-
-        return default
+        return option_plan(ctx.command).default(ctx, option)
 
     @staticmethod
     def _get_service(options):
@@ -159,40 +477,682 @@ class KeyRing:
 
     def get(self, ctx):
         """Get a password saved previously for the provided hostname and username."""
+        return self.fetch(self.service(ctx), self.username(ctx))
+
+    def fetch(self, service, username):
+        """Get a password saved previously for an already resolved service and username."""
+        return self._load(service, username, self._fetch_stored(service, username))
+
+    def _load(self, service, username, stored):
+        """Convert a stored value read for service and username to the password."""
+        return self._decode(stored)
+
+    def _fetch_stored(self, service, username):
+        """Get the stored value, or None if missing or the store failed."""
+        try:
+            return self._backend_get(service, username)
+        except StoreError:
+            return None
+
+    def _fetch_stored_many(self, pairs):
+        """Get many stored values, reading the misses with one store.get_many call."""
+        stored = [self._cached_get(service, username) for service, username in pairs]
+        missing = [i for i, value in enumerate(stored) if value is None]
+        if missing and self.cache:
+            missing = [i for i in missing if not self._known_missing(*pairs[i])]
+        if missing:
+            start = time.perf_counter()
+            try:
+                fetched = self.store.get_many(
+                    [pairs[i] for i in missing], default=_UNREADABLE
+                )
+            except StoreError:
+                fetched = [_UNREADABLE] * len(missing)
+            for i, value in zip(missing, fetched):
+                stored[i] = None if value is _UNREADABLE else value
+            self._fill_caches(
+                [pairs[i] + (stored[i],) for i in missing if stored[i] is not None]
+            )
+            self._cache_misses(
+                [pairs[i] for i, value in zip(missing, fetched) if value is None]
+            )
+            for i in missing:
+                self._emit(
+                    "backend_get",
+                    start,
+                    service=pairs[i][0],
+                    username=pairs[i][1],
+                    hit=bool(stored[i]),
+                )
+        return stored
+
+    def _emit(self, event, start, **data):
+        """Send an event to the observer with the duration since start."""
+        if self.observer.enabled:
+            self.observer.emit(event, duration=time.perf_counter() - start, **data)
+
+    def _resolve(self, ctx):
+        """Return the service name and username for this invocation."""
+        start = time.perf_counter()
+        service, username = self.service(ctx), self.username(ctx)
+        self._emit("service", start, service=service, username=username)
+        return service, username
+
+    def _prompt(self, service, text="Password"):
+        start = time.perf_counter()
+        value = click.prompt(text, hide_input=True, type=str)
+        self._emit("prompt", start, service=service)
+        return value
+
+    def save(self, service, username, password, options=None):
+        """
+        Save a keyring credential for the provided hostname and username.
+
+        Args:
+            service (str): keyring service name
+            username (str): username
+            password (str): password to save
+            options (None, dict): other_options values recorded in the manifest
+        """
+        start = time.perf_counter()
+        self.write_many([(service, username, self._encode(password))], [options])
+        self._emit("save", start, count=1)
+
+    def fetch_many(self, pairs):
+        """
+        Get saved passwords for many credentials.
+
+        Lookups are spread over a thread pool of up to `max_workers` threads
+        unless the store is not thread safe. Otherwise the store is read with
+        one `get_many` call.
+
+        Args:
+            pairs (list): (service, username) tuples
+
+        Returns:
+            list: password or None for each pair, in the same order
+        """
+        pairs = [tuple(pair) for pair in pairs]
+        workers = min(self.max_workers, len(pairs))
+        if workers <= 1 or not self.store.thread_safe:
+            stored = self._fetch_stored_many(pairs)
+            return [self._load(s, u, value) for (s, u), value in zip(pairs, stored)]
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda pair: self.fetch(*pair), pairs))
+
+    def save_many(self, items, options=None):
+        """
+        Save many keyring credentials as one batch.
+
+        Args:
+            items (list): (service, username, password) tuples
+            options (None, list): other_options values dict for each item,
+             recorded in the manifest
+        """
+        start = time.perf_counter()
+        items = list(items)
+        values = self.encode_many([pw for _, _, pw in items])
+        self.write_many([(s, u, v) for (s, u, _), v in zip(items, values)], options)
+        self._emit("save", start, count=len(items))
+
+    def write_many(self, items, options=None):
+        """
+        Write many values returned by `encode_many` and record them in the manifest.
+
+        Args:
+            items (list): (service, username, stored value) tuples
+            options (None, list): other_options values dict for each item,
+             recorded in the manifest
+        """
+        items = list(items)
+        options = options or [None] * len(items)
+        self._backend_set_many(items, options)
+        self.record_saved([(s, u, o) for (s, u, _), o in zip(items, options)])
+
+    def record_saved(self, items, store_recorded=None):
+        """
+        Record saved credentials in the manifest if enabled.
+
+        Nothing is recorded if the store records its writes in the same
+        manifest, as `write_many` already passed it the options.
+        Manifest errors are ignored as it is only an index of the store.
+
+        Args:
+            items (list): (service, username, options) tuples
+            store_recorded (None, bool): whether the store recorded the items.
+             Defaults to `store_records_manifest`
+        """
+        if store_recorded is None:
+            store_recorded = self.store_records_manifest
+        if self.manifest is None or store_recorded:
+            return
         try:
-            return keyring.get_password(self.service(ctx), self.username(ctx))
-        except keyring.errors.KeyringError:
+            self.manifest.record_many(items)
+        except OSError:
+            pass
+
+    @property
+    def store_records_manifest(self):
+        """True if the store records its writes in the KeyRing manifest."""
+        return (
+            self.manifest is not None
+            and getattr(self.store, "manifest", None) is self.manifest
+        )
+
+    def option_map(self, ctx):
+        """Return the other_options values as a dict, or None if there is no manifest."""
+        if self.manifest is None:
             return None
+        return {o: self._get_option_values(ctx, o) for o in self.other_options}
+
+    def _encode(self, password):
+        """Convert a password to the value stored in keyring."""
+        return password
+
+    def encode_many(self, passwords):
+        """
+        Convert many passwords to the values stored in keyring.
 
-    def save(self, service, username, password):
-        """Save a keyring credential for the provided hostname and username."""
-        keyring.set_password(service, username, password)
+        Args:
+            passwords (iterable): passwords to convert
 
-    def __call__(self, ctx, _, value):
+        Returns:
+            list: stored values, in the same order
+        """
+        return [self._encode(password) for password in passwords]
+
+    def _decode(self, stored):
+        """Convert a value stored in keyring back to the password."""
+        return stored
+
+    def _cached_get(self, service, username):
+        """
+        Read from the credential cache and the file cache if enabled.
+
+        A hit is emitted as a "cache_get" event with the cache it came from.
+        """
+        if not self.cache and self.file_cache is None:
+            return None
+        start = time.perf_counter()
+        value = source = None
+        if self.cache:
+            value, source = credential_cache.get(service, username), "memory"
+        if value is None and self.file_cache is not None:
+            value, source = self.file_cache.get(service, username), "file"
+            if self.cache and value is not None:
+                credential_cache.set(service, username, value)
+        if value is not None:
+            self._emit(
+                "cache_get",
+                start,
+                service=service,
+                username=username,
+                source=source,
+                hit=True,
+            )
+        return value
+
+    def _fill_caches(self, items):
+        """Add values read from the store to the enabled caches."""
+        if self.cache:
+            for service, username, value in items:
+                credential_cache.set(service, username, value)
+        if self.file_cache is not None and items:
+            self._file_cache_set(items)
+
+    def _backend_get(self, service, username):
+        """
+        Read the stored value.
+
+        The credential cache and the file cache are consulted first if enabled
+        and filled from the store on a miss.
+        """
+        value = self._cached_get(service, username)
+        if value is None:
+            if self._known_missing(service, username):
+                return None
+            value = self._store_get(service, username)
+            if value is not None:
+                self._fill_caches([(service, username, value)])
+            else:
+                self._cache_misses([(service, username)])
+        return value
+
+    def _store_get(self, service, username):
+        """Read the store, emitting "backend_get"."""
+        start = time.perf_counter()
+        value = None
+        try:
+            value = self.store.get(service, username)
+            return value
+        finally:
+            self._emit(
+                "backend_get",
+                start,
+                service=service,
+                username=username,
+                hit=bool(value),
+            )
+
+    def _known_missing(self, service, username):
+        """
+        Return True if the credential cache recorded service and username as missing.
+
+        A recorded miss is emitted as a "cache_get" event without a hit.
+        """
+        if not self.cache:
+            return False
+        start = time.perf_counter()
+        if not credential_cache.is_missing(service, username):
+            return False
+        self._emit(
+            "cache_get",
+            start,
+            service=service,
+            username=username,
+            source="memory",
+            hit=False,
+        )
+        return True
+
+    def _cache_misses(self, pairs):
+        """Record (service, username) pairs the store has no value for."""
+        if self.cache:
+            for service, username in pairs:
+                credential_cache.set_missing(service, username)
+
+    def _backend_set(self, service, username, value):
+        """Write the stored value and update the caches if enabled."""
+        self._backend_set_many([(service, username, value)])
+
+    def _file_cache_set(self, items):
+        """Update the file cache. Errors are ignored as the store remains the source of truth."""
+        try:
+            self.file_cache.set_many(items)
+        except Exception:
+            pass
+
+    def _backend_set_many(self, items, options=None):
+        """
+        Write many stored values with one store.set_many call, then update the caches.
+
+        The other_options `options` are passed to stores recording their writes
+        in the KeyRing manifest.
+        """
+        items = list(items)
+        if options is not None and self.store_records_manifest:
+            self.store.set_many(items, options=options)
+        else:
+            self.store.set_many(items)
+        self._fill_caches(items)
+
+    def is_bulk(self, ctx):
+        """Return True if any of the other_options accepts multiple values."""
+        multiple = option_plan(ctx.command).multiple
+        return any(o in multiple for o in self.other_options)
+
+    def resolve_many(self, ctx, value):
+        """
+        Resolve one password per combination of the other_options values.
+
+        Args:
+            ctx (click.Context): CLI context
+            value (None, str): password provided to the option. If set, it is
+             used for every combination.
+
+        Returns:
+            dict: password keyed by the other_options value, or by a tuple of
+             values when there are several other_options
+        """
+        lookup = self._bulk_begin(ctx)
+        fetched = self.fetch_many(lookup.missing)
+        passwords, to_save, options = self._bulk_settle(lookup, value, fetched)
+        if to_save:
+            try:
+                self.save_many(to_save, options)
+            except StoreUnavailable:
+                # the password is still returned, it is saved on a later run
+                pass
+        self.index_username(ctx, lookup.username)
+        return passwords
+
+    def _bulk_begin(self, ctx):
+        """Resolve the service names of a bulk invocation and the pairs to read from the store."""
+        lookup = _Lookup(self.shared(ctx))
+        lookup.username, lookup.combos, lookup.services = self._bulk_targets(ctx)
+        lookup.known, lookup.missing = self._split_shared(
+            lookup.shared, lookup.services, lookup.username
+        )
+        return lookup
+
+    def _bulk_settle(self, lookup, value, fetched):
+        """
+        Complete a bulk invocation with the values read for `lookup.missing`.
+
+        Returns:
+            tuple: password map, items to save and their other_options values
+        """
+        stored = self._join_shared(lookup.known, fetched)
+        passwords, to_save = self._bulk_complete(
+            value,
+            lookup.username,
+            lookup.combos,
+            lookup.services,
+            stored,
+            lookup.shared,
+        )
+        options = self._bulk_options(lookup.combos, lookup.services, to_save)
+        return passwords, to_save, options
+
+    def _bulk_targets(self, ctx):
+        """Return the username, other_options value combinations and their service names."""
+        start = time.perf_counter()
+        prefix = self.prefix or ctx.command.name
+        username = self.username(ctx)
+        multiple = option_plan(ctx.command).multiple
+        columns = []
+        for option in self.other_options:
+            option_value = self._get_option_values(ctx, option)
+            columns.append(option_value if option in multiple else (option_value,))
+
+        combos = list(itertools.product(*columns))
+        services = [self.build_service(prefix, combo) for combo in combos]
+        self._emit("service", start, service=services, username=username)
+        return username, combos, services
+
+    def _bulk_complete(self, value, username, combos, services, stored, shared=None):
+        """Prompt for missing passwords and return the password map and items to save."""
+        passwords = {}
+        to_save = []
+        for combo, service, existing in zip(combos, services, stored):
+            password = value or existing
+            if not password:
+                password = self._prompt(service, "Password for {}".format(service))
+            if self.should_save(password, existing) and not self._is_shared(
+                shared, service, username, password
+            ):
+                to_save.append((service, username, password))
+            if shared is not None:
+                shared[(service, username)] = password
+            passwords[combo[0] if len(combo) == 1 else combo] = password
+        return passwords, to_save
+
+    def _bulk_options(self, combos, services, to_save):
+        """Return the other_options values of each item to save, or None if there is no manifest."""
+        if self.manifest is None:
+            return None
+        by_service = dict(zip(services, combos))
+        return [dict(zip(self.other_options, by_service[s])) for s, _, _ in to_save]
+
+    def shared(self, ctx):
+        """
+        Return the passwords resolved so far in this invocation.
+
+        The dict is kept in `ctx.meta`, which click shares between a context and
+        all of its sub contexts, keyed by (service, username).
+
+        Returns:
+            None, dict: None if sharing is disabled
+        """
+        if not self.share or ctx is None:
+            return None
+        return ctx.meta.setdefault(SHARED_META_KEY, {})
+
+    @staticmethod
+    def _is_shared(shared, service, username, password):
+        """Return True if password was already resolved for service and username."""
+        return shared is not None and shared.get((service, username)) == password
+
+    @staticmethod
+    def _split_shared(shared, services, username):
+        """Return shared passwords (None if missing) and the pairs to read from the store."""
+        pairs = [(service, username) for service in services]
+        if not shared:
+            return [None] * len(pairs), pairs
+        known = [shared.get(pair) for pair in pairs]
+        return known, [pair for pair, k in zip(pairs, known) if k is None]
+
+    @staticmethod
+    def _join_shared(known, fetched):
+        """Fill the missing shared passwords with the values read from the store."""
+        fetched = iter(fetched)
+        return [next(fetched) if k is None else k for k in known]
+
+    def should_save(self, value, stored):
+        """
+        Apply the write policy to decide whether value must be saved.
+
+        Args:
+            value (str): password that will be returned to the command
+            stored (None, str): password read from keyring during this invocation
+
+        Returns:
+            bool: True if value should be written to keyring
+        """
+        if self.write == WRITE_NEVER:
+            return False
+        if self.write == WRITE_ON_CHANGE:
+            return value != stored
+        return True
+
+    def skip_backend(self, ctx, param):
+        """
+        Return True if the value came from one of the `skip_sources`.
+
+        Parameter sources require click 8, older versions never skip.
+        """
+        if not self.skip_sources or param is None:
+            return False
+        get_source = getattr(ctx, "get_parameter_source", None)
+        if get_source is None:
+            return False
+        source = get_source(param.name)
+        return source is not None and source.name in self.skip_sources
+
+    def skipped_value(self, ctx, value):
+        """Return value in the shape the command expects without touching keyring."""
+        if not self.is_bulk(ctx):
+            return value
+        _, combos, _ = self._bulk_targets(ctx)
+        return {combo[0] if len(combo) == 1 else combo: value for combo in combos}
+
+    def prefetch(self, ctx, param, opts):
+        """
+        Start reading the stored password on a background thread.
+
+        The service name and username are predicted from the raw command line
+        values, envvars and defaults. Nothing is started if the password was
+        given, if any input is unknown or if the option resolves several passwords.
+
+        Args:
+            ctx (click.Context): context being parsed
+            param (click.Option): this keyring option
+            opts (dict): raw option values from the command line parser
+        """
+        if opts.get(param.name) is not None or self.skip_sources:
+            return
+        if not self.store.thread_safe:
+            return
+        if param.resolve_envvar_value(ctx) is not None:
+            return
+        plan = option_plan(ctx.command)
+        values = []
+        for option in (self.user_option,) + tuple(self.other_options):
+            target = plan.params.get(option)
+            if target is None or option in plan.multiple:
+                return
+            try:
+                value = opts.get(option)
+                if value is None:
+                    value = target.resolve_envvar_value(ctx)
+                if value is not None:
+                    value = target.type_cast_value(ctx, value)
+                else:
+                    value = plan.default(ctx, option)
+            except Exception:
+                return
+            if value is None or callable(value):
+                return
+            values.append(value)
+
+        username = values[0]
+        service = self.build_service(self.prefix or ctx.command.name, values[1:])
+        futures = ctx.meta.setdefault(PREFETCH_META_KEY, {})
+        key = (self, service, username)
+        if key not in futures:
+            futures[key] = start_lookup(self._fetch_stored, service, username)
+
+    def _take_prefetched(self, ctx, service, username):
+        """Return the prefetch Future for service and username, or None."""
+        futures = ctx.meta.get(PREFETCH_META_KEY)
+        if not futures:
+            return None
+        return futures.pop((self, service, username), None)
+
+    def _fetch_prefetched(self, ctx, service, username):
+        """Join a matching prefetch or read the password from the store."""
+        future = self._take_prefetched(ctx, service, username)
+        if future is None:
+            return self.fetch(service, username)
+        return self._load(service, username, future.result())
+
+    def index_username(self, ctx, username):
+        """Record username in the username index if enabled."""
+        if self.username_index is not None and username:
+            self.username_index.add(self.prefix or ctx.command.name, username)
+
+    def _early_result(self, ctx, param, value):
+        """Return the callback result if keyring must not be used, otherwise _PENDING."""
+        # shell completion: never read, prompt or save
+        if ctx.resilient_parsing:
+            return value
+        if value and self.skip_backend(ctx, param):
+            return self.skipped_value(ctx, value)
+        return _PENDING
+
+    def _begin(self, ctx, value):
+        """
+        Resolve the service name and username when needed and check the shared passwords.
+
+        Sets `answered` if a shared password is the result and `fetch` if the
+        stored password must be read.
+        """
+        lookup = _Lookup(self.shared(ctx))
+        # service and username are resolved at most once per invocation
+        if lookup.shared is not None or not value or self.write == WRITE_ON_CHANGE:
+            lookup.service, lookup.username = self._resolve(ctx)
+        key = (lookup.service, lookup.username)
+        if lookup.shared and key in lookup.shared:
+            lookup.stored = lookup.shared[key]
+            lookup.answered = not value or value == lookup.stored
+        else:
+            lookup.fetch = not value or self.write == WRITE_ON_CHANGE
+        return lookup
+
+    def _settle(self, ctx, lookup, value):
+        """
+        Pick the password, prompting if there is none, and apply the write policy.
+
+        Returns:
+            tuple: the password and the `save` arguments, or None if it is not saved
+        """
         if not value:
-            value = self.get(ctx)
+            value = lookup.stored
         if not value:
-            value = click.prompt("Password", hide_input=True, type=str)
+            value = self._prompt(lookup.service)
+        if not self.should_save(value, lookup.stored):
+            return value, None
+        if lookup.service is None:
+            lookup.service, lookup.username = self._resolve(ctx)
+        return value, (lookup.service, lookup.username, value, self.option_map(ctx))
 
-        self.save(self.service(ctx), self.username(ctx), value)
+    def _end(self, ctx, lookup, value):
+        """Share the password with later options and index the username."""
+        if lookup.shared is not None:
+            lookup.shared[(lookup.service, lookup.username)] = value
+        self.index_username(ctx, lookup.username)
         return value
 
+    def __call__(self, ctx, param, value):
+        result = self._early_result(ctx, param, value)
+        if result is not _PENDING:
+            return result
+        if self.is_bulk(ctx):
+            return self.resolve_many(ctx, value)
+
+        lookup = self._begin(ctx, value)
+        if lookup.answered:
+            return lookup.stored
+        if lookup.fetch:
+            lookup.stored = self._fetch_prefetched(ctx, lookup.service, lookup.username)
+        value, save = self._settle(ctx, lookup, value)
+        if save is not None:
+            try:
+                self.save(*save)
+            except StoreUnavailable:
+                # the password is still returned, it is saved on a later run
+                pass
+        return self._end(ctx, lookup, value)
+
 
 class EncKeyRing(KeyRing):
+    """
+    KeyRing that encrypts passwords with Fernet before saving them.
+
+    The key is read from the `key` class attribute or the "CLICK_KEYRING_KEY"
+    envvar. Several comma separated keys may be given, primary key first, to
+    rotate keys. A password encrypted with an older key is re-encrypted with the
+    primary key the next time the option reads it, unless the write policy is "never".
+
+    Batches of at least `batch_threshold` passwords per worker are encrypted and
+    decrypted in a thread pool, or a process pool if `batch_processes` is True.
+    """
+
     key = None
+    batch_threshold = 256
+    batch_processes = False
 
-    def __init__(self, prefix, username_option, other_options=None):
-        super().__init__(prefix, username_option, other_options)
-        self.fernet = self._init_f()
+    @property
+    def fernet(self):
+        """Shared Fernet (or MultiFernet) cipher for the current keys."""
+        return get_cipher(self._key())
 
-    def get(self, ctx):
-        pw = super().get(ctx)
-        if pw:
-            return self.decrypt(pw)
+    def _load(self, service, username, stored):
+        """Decrypt a saved password, re-encrypting it if the key rotated."""
+        if not stored:
+            return None
+        start = time.perf_counter()
+        password, current = decrypt_current(self._key(), stored.encode())
+        password = password.decode()
+        self._emit("decrypt", start, service=service, username=username)
+        if not current and self.write == WRITE_ON_CHANGE:
+            self._rotate(service, username, password)
+        return password
+
+    def _rotate(self, service, username, password):
+        """
+        Save password encrypted with the primary key. Failures are ignored.
+
+        Only used with the "on-change" policy, which would not save the
+        unchanged password. With "always" the option saves it anyway.
+        """
+        try:
+            self._backend_set(service, username, self.encrypt(password))
+        except StoreError:
+            pass
+
+    def _encode(self, password):
+        return self.encrypt(password)
+
+    def encode_many(self, passwords):
+        return self.encrypt_many(passwords)
 
-    def save(self, service, username, password):
-        """Save a keyring credential for the provided hostname and username."""
-        keyring.set_password(service, username, self.encrypt(password))
+    def _decode(self, stored):
+        """Decrypt a saved password. Comparisons use the plaintext."""
+        if stored:
+            return self.decrypt(stored)
 
     def decrypt(self, pw):
         return self.fernet.decrypt(pw.encode()).decode()
@@ -200,12 +1160,50 @@ class EncKeyRing(KeyRing):
     def encrypt(self, pw):
         return self.fernet.encrypt(pw.encode()).decode()
 
-    def _init_f(self):
+    def encrypt_many(self, passwords, workers=None):
+        """
+        Encrypt many passwords with the primary key.
+
+        Args:
+            passwords (iterable): passwords to encrypt
+            workers (None, int): maximum number of workers. Defaults to the CPU count
+
+        Returns:
+            list: encrypted passwords, in the same order
+        """
+        return encrypt_many(
+            self._key(),
+            passwords,
+            workers=workers,
+            processes=self.batch_processes,
+            threshold=self.batch_threshold,
+        )
+
+    def decrypt_many(self, tokens, workers=None):
+        """
+        Decrypt many passwords encrypted with any of the keys.
+
+        Args:
+            tokens (iterable): encrypted passwords
+            workers (None, int): maximum number of workers. Defaults to the CPU count
+
+        Returns:
+            list: passwords, in the same order
+        """
+        return decrypt_many(
+            self._key(),
+            tokens,
+            workers=workers,
+            processes=self.batch_processes,
+            threshold=self.batch_threshold,
+        )
+
+    def _key(self):
         err = (
-            "No encrypt key found. Set ClickKeyRing.key "
+            "No encrypt key found. Set EncKeyRing.key "
             'class attribute or "CLICK_KEYRING_KEY" envvar'
         )
-        key = self.key or os.environ.get("CLICK_KEYRING_KEY")
-        if not key:
-            click.exceptions.ClickException(err)
-        return Fernet(key)
+        keys = parse_keys(self.key or os.environ.get("CLICK_KEYRING_KEY") or "")
+        if not keys:
+            raise click.exceptions.ClickException(err)
+        return keys
@@ -0,0 +1,219 @@
+"""
+Credential agent serving keyring lookups over a Unix domain socket.
+
+Similar to ssh-agent, the agent is a long running local process that keeps
+keyring values in memory for a configurable lifetime. When the
+"CLICK_KEYRING_AGENT_SOCK" envvar points at its socket, KeyRing talks to the
+agent instead of initializing a keyring backend in every process. If the agent
+cannot be reached, KeyRing falls back to keyring directly.
+
+The protocol is one JSON object per line in each direction:
+
+    {"op": "get", "service": "...", "username": "..."}
+    {"op": "set", "service": "...", "username": "...", "value": "..."}
+    {"op": "delete", "service": "...", "username": "..."}
+    {"op": "ping"}
+
+Responses are {"ok": true, "value": ...} or {"ok": false, "error": "..."}.
+
+Values are held as stored in keyring. Passwords of encrypted options are
+decrypted by the client, so the agent never holds the encryption key and
+plaintext passwords are not sent over the socket.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+import socketserver
+
+AGENT_SOCK_ENVVAR = "CLICK_KEYRING_AGENT_SOCK"
+
+
+class AgentUnavailable(OSError):
+    """Raised when the agent socket cannot be reached."""
+
+
+class AgentRunning(OSError):
+    """Raised when another agent already answers on the socket path."""
+
+
+class AgentClient:
+    """
+    Client for a running agent with the same interface as the keyring module.
+
+    Args:
+        path (str): agent socket path
+        timeout (float): socket timeout in seconds
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+
+    def request(self, op, **data):
+        """Send one request and return the response value."""
+        data["op"] = op
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.path)
+                sock.sendall(json.dumps(data).encode() + b"\n")
+                with sock.makefile("rb") as fh:
+                    line = fh.readline()
+        except (OSError, AttributeError) as ex:
+            raise AgentUnavailable(str(ex))
+        if not line:
+            raise AgentUnavailable("Agent closed the connection")
+
+        response = json.loads(line.decode())
+        if not response.get("ok"):
+            import keyring
+
+            raise keyring.errors.KeyringError(response.get("error"))
+        return response.get("value")
+
+    def get_password(self, service, username):
+        return self.request("get", service=service, username=username)
+
+    def set_password(self, service, username, password):
+        self.request("set", service=service, username=username, value=password)
+
+    def delete_password(self, service, username):
+        self.request("delete", service=service, username=username)
+
+    def ping(self):
+        return self.request("ping")
+
+
+def agent_client():
+    """Return an AgentClient if the agent envvar is set, otherwise None."""
+    path = os.environ.get(AGENT_SOCK_ENVVAR)
+    if not path or not hasattr(socket, "AF_UNIX"):
+        return None
+    return AgentClient(path)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                value = self.server.agent.dispatch(json.loads(line.decode()))
+                response = {"ok": True, "value": value}
+            except Exception as ex:
+                response = {"ok": False, "error": str(ex)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Agent:
+    """
+    Agent holding keyring values in memory and answering socket requests.
+
+    Values not held by the agent are read from the store, by default the keyring
+    backend configured in the agent process, then kept for `lifetime` seconds.
+
+    Args:
+        path (str): socket path to listen on
+        lifetime (None, float): seconds a value is held. None keeps values until exit
+        clock (callable): time source, defaults to time.monotonic
+        store (None, CredentialStore): store holding the credentials
+    """
+
+    def __init__(self, path, lifetime=3600, clock=time.monotonic, store=None):
+        from .stores import KeyringStore
+
+        self.path = path
+        self.lifetime = lifetime
+        self.clock = clock
+        self.store = store or KeyringStore(use_agent=False)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def dispatch(self, request):
+        """Run a request and return the response value."""
+        op = request.get("op")
+        if op == "ping":
+            return "pong"
+        key = (request["service"], request["username"])
+        if op == "get":
+            return self.get(*key)
+        if op == "set":
+            return self.set(*key, request["value"])
+        if op == "delete":
+            return self.delete(*key)
+        raise ValueError('Unknown operation "{}"'.format(op))
+
+    def get(self, service, username):
+        with self._lock:
+            entry = self._entries.get((service, username))
+        if entry is not None:
+            value, expires = entry
+            if expires is None or expires > self.clock():
+                return value
+        value = self.store.get(service, username)
+        if value is not None:
+            self._hold(service, username, value)
+        return value
+
+    def set(self, service, username, value):
+        self.store.set(service, username, value)
+        self._hold(service, username, value)
+
+    def delete(self, service, username):
+        with self._lock:
+            self._entries.pop((service, username), None)
+        self.store.delete(service, username)
+
+    def _hold(self, service, username, value):
+        expires = None if self.lifetime is None else self.clock() + self.lifetime
+        with self._lock:
+            self._entries[(service, username)] = (value, expires)
+
+    def start(self):
+        """
+        Bind the socket. Only the current user can connect.
+
+        A socket file left by an agent that exited is replaced.
+
+        Raises:
+            AgentRunning: if an agent answers on the socket path
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            try:
+                AgentClient(self.path, timeout=1.0).ping()
+            except AgentUnavailable:
+                os.unlink(self.path)
+            else:
+                raise AgentRunning(
+                    "An agent is already running on {}".format(self.path)
+                )
+        old_umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.path, _Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.agent = self
+
+    def serve_forever(self):
+        """Serve requests until `shutdown` is called."""
+        if self._server is None:
+            self.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def shutdown(self):
+        """Stop a running `serve_forever` call."""
+        if self._server is not None:
+            self._server.shutdown()
@@ -0,0 +1,145 @@
+"""
+asyncio variants of the click_keyring callbacks.
+
+Store calls are offloaded to an executor so the event loop keeps running
+while the secret store answers. Natively async stores (see
+`CredentialStore.async_store`), including keyring backends that provide
+`aget_password` and `aset_password` coroutines, are awaited directly instead.
+"""
+
+import time
+import asyncio
+import functools
+from . import KeyRing, EncKeyRing, StoreError, StoreUnavailable, _PENDING
+
+
+class AsyncKeyRingMixin:
+    """
+    Adds awaitable get/save methods and an async click callback to a KeyRing.
+
+    Set `executor` to a concurrent.futures executor to control where blocking
+    backend calls run. By default the event loop's default executor is used.
+    """
+
+    executor = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def aget(self, ctx):
+        """Get a password saved previously for the provided hostname and username."""
+        return await self.afetch(self.service(ctx), self.username(ctx))
+
+    async def afetch(self, service, username):
+        """Awaitable version of `fetch`."""
+        store = self.store.async_store()
+        if store is None:
+            return await self._run(self.fetch, service, username)
+
+        stored = self._cached_get(service, username)
+        if stored is None and not self._known_missing(service, username):
+            start = time.perf_counter()
+            try:
+                stored = await store.aget(service, username)
+            except StoreError:
+                pass
+            else:
+                if stored is not None:
+                    self._fill_caches([(service, username, stored)])
+                else:
+                    self._cache_misses([(service, username)])
+            self._emit(
+                "backend_get",
+                start,
+                service=service,
+                username=username,
+                hit=bool(stored),
+            )
+        return self._load(service, username, stored)
+
+    async def afetch_many(self, pairs):
+        """
+        Awaitable version of `fetch_many`.
+
+        Lookups run concurrently with asyncio.gather unless the store is not
+        thread safe, in which case they are awaited one at a time.
+        """
+        pairs = list(pairs)
+        if not self.store.thread_safe:
+            return [await self.afetch(service, username) for service, username in pairs]
+        return list(await asyncio.gather(*(self.afetch(s, u) for s, u in pairs)))
+
+    async def asave(self, service, username, password, options=None):
+        """Awaitable version of `save`."""
+        store = self.store.async_store()
+        if store is None:
+            return await self._run(self.save, service, username, password, options)
+
+        start = time.perf_counter()
+        stored = self._encode(password)
+        await store.aset(service, username, stored)
+        self._fill_caches([(service, username, stored)])
+        self.record_saved([(service, username, options)], store_recorded=False)
+        self._emit("save", start, count=1)
+
+    async def asave_many(self, items, options=None):
+        """Awaitable version of `save_many`."""
+        if self.store.async_store() is None:
+            return await self._run(self.save_many, items, options)
+        options = options or [None] * len(items)
+        await asyncio.gather(
+            *(self.asave(s, u, pw, o) for (s, u, pw), o in zip(items, options))
+        )
+
+    async def aresolve_many(self, ctx, value):
+        """Awaitable version of `resolve_many`."""
+        lookup = self._bulk_begin(ctx)
+        fetched = await self.afetch_many(lookup.missing)
+        passwords, to_save, options = self._bulk_settle(lookup, value, fetched)
+        if to_save:
+            try:
+                await self.asave_many(to_save, options)
+            except StoreUnavailable:
+                # the password is still returned, it is saved on a later run
+                pass
+        self.index_username(ctx, lookup.username)
+        return passwords
+
+    async def __call__(self, ctx, param, value):
+        result = self._early_result(ctx, param, value)
+        if result is not _PENDING:
+            return result
+        if self.is_bulk(ctx):
+            return await self.aresolve_many(ctx, value)
+
+        lookup = self._begin(ctx, value)
+        if lookup.answered:
+            return lookup.stored
+        if lookup.fetch:
+            lookup.stored = await self._afetch_prefetched(
+                ctx, lookup.service, lookup.username
+            )
+        value, save = self._settle(ctx, lookup, value)
+        if save is not None:
+            try:
+                await self.asave(*save)
+            except StoreUnavailable:
+                # the password is still returned, it is saved on a later run
+                pass
+        return self._end(ctx, lookup, value)
+
+    async def _afetch_prefetched(self, ctx, service, username):
+        """Awaitable version of `_fetch_prefetched`."""
+        future = self._take_prefetched(ctx, service, username)
+        if future is None:
+            return await self.afetch(service, username)
+        return self._load(service, username, await asyncio.wrap_future(future))
+
+
+class AsyncKeyRing(AsyncKeyRingMixin, KeyRing):
+    pass
+
+
+class AsyncEncKeyRing(AsyncKeyRingMixin, EncKeyRing):
+    pass
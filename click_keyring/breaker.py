@@ -0,0 +1,98 @@
+"""
+Circuit breaker shared by processes through a small local state file.
+
+When a keyring backend is unavailable (ex: locked SecretService or no D-Bus
+session on a headless host) every call waits out the backend timeout. After
+`failures` consecutive failures the breaker opens and the backend is skipped
+for `cooldown` seconds. The state is kept in a file so separate invocations
+of a command skip the backend too.
+"""
+
+import os
+import json
+import time
+import threading
+from .filecache import cache_dir, locked, atomic_write
+
+
+class CircuitBreaker:
+    """
+    Consecutive failure counter that opens for a cool-down period.
+
+    Once the cool-down has passed, the next call is allowed through. If it
+    fails the breaker opens again, if it succeeds the failure count is reset.
+    State file errors are ignored and treated as a closed breaker.
+
+    Args:
+        path (None, str): state file. Defaults to "keyring.breaker" in `cache_dir()`
+        failures (int): consecutive failures that open the breaker
+        cooldown (float): seconds the backend is skipped once open
+        clock (callable): time source, defaults to time.time
+    """
+
+    def __init__(self, path=None, failures=3, cooldown=60.0, clock=time.time):
+        self.path = path or os.path.join(cache_dir(), "keyring.breaker")
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._state = {}
+
+    def _read(self):
+        """Return the state, reusing the parsed copy if the file is unchanged."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return {}
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if stamp == self._stamp:
+                return self._state
+        try:
+            with open(self.path, "rb") as fh:
+                state = json.loads(fh.read().decode())
+        except (OSError, ValueError):
+            state = {}
+        with self._lock:
+            self._stamp, self._state = stamp, state
+        return state
+
+    def _update(self, func):
+        try:
+            with locked(self.path):
+                state = func(dict(self._read()))
+                atomic_write(self.path, json.dumps(state).encode())
+        except OSError:
+            pass
+
+    @property
+    def open_until(self):
+        """Time until which calls are skipped, or None if the breaker is closed."""
+        return self._read().get("open_until")
+
+    def allow(self):
+        """Return True if the backend may be called."""
+        open_until = self.open_until
+        return open_until is None or open_until <= self.clock()
+
+    def record_success(self):
+        """Close the breaker and reset the failure count."""
+        if self._read():
+            self._update(lambda state: {})
+
+    def record_failure(self):
+        """Count a failure, opening the breaker once `failures` is reached."""
+
+        def update(state):
+            count = state.get("failures", 0) + 1
+            state["failures"] = count
+            if count >= self.failures:
+                state["open_until"] = self.clock() + self.cooldown
+            return state
+
+        self._update(update)
+
+    def reset(self):
+        """Close the breaker."""
+        self._update(lambda state: {})
@@ -0,0 +1,115 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class CredentialCache:
+    """
+    Process-local cache of keyring values keyed by (service, username).
+
+    Entries expire after `ttl` seconds and the least recently used entry
+    is evicted once `maxsize` entries are held. Values are stored exactly
+    as returned by the keyring backend, so encrypted passwords stay encrypted.
+
+    Lookups that found no value can be recorded with `set_missing` so repeated
+    lookups of absent entries skip the backend for `negative_ttl` seconds.
+
+    Args:
+        ttl (None, float): seconds an entry stays valid. None disables expiry
+        maxsize (int): maximum number of entries to hold
+        clock (callable): time source, defaults to time.monotonic
+        negative_ttl (float): seconds a missing entry is remembered. 0 disables it
+    """
+
+    def __init__(self, ttl=300, maxsize=256, clock=time.monotonic, negative_ttl=30):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, ttl=None, maxsize=None, negative_ttl=None):
+        """Change the TTLs and/or size bound. Existing entries are trimmed to fit."""
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if negative_ttl is not None:
+                self.negative_ttl = negative_ttl
+            self._trim()
+
+    def _entry(self, key):
+        """Return the live (value, expires) entry for key or None. Call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires = entry[1]
+        if expires is not None and expires <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, service, username):
+        """Return the cached value or None if missing or expired."""
+        with self._lock:
+            entry = self._entry((service, username))
+        return None if entry is None else entry[0]
+
+    def is_missing(self, service, username):
+        """Return True if a recent lookup found no value for service and username."""
+        with self._lock:
+            entry = self._entry((service, username))
+        return entry is not None and entry[0] is None
+
+    def set(self, service, username, value):
+        """Add or replace an entry and evict the oldest entries if over maxsize."""
+        self._set((service, username), value, self.ttl)
+
+    def set_missing(self, service, username):
+        """Remember that service and username have no stored value."""
+        if self.negative_ttl:
+            self._set((service, username), None, self.negative_ttl)
+
+    def _set(self, key, value, ttl):
+        expires = None if ttl is None else self.clock() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            self._trim()
+
+    def invalidate(self, service, username=None):
+        """
+        Remove cached entries for a service.
+
+        Args:
+            service (str): keyring service name
+            username (None, str): remove only this username. If None, all
+             usernames for the service are removed.
+        """
+        with self._lock:
+            if username is not None:
+                self._entries.pop((service, username), None)
+                return
+            for key in [k for k in self._entries if k[0] == service]:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def _trim(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(*key) is not None
+
+
+credential_cache = CredentialCache()
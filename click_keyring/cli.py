@@ -0,0 +1,354 @@
+"""
+click-keyring command line tool.
+"""
+
+import os
+import json
+import fnmatch
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import click
+from . import __version__
+from .agent import Agent, AgentRunning, AGENT_SOCK_ENVVAR
+from .filecache import FileCache, cache_dir
+from .importer import FORMATS, read_rows, guess_format, import_credentials
+from .manifest import Manifest
+from .stores import StoreError, KeyringStore, SQLiteStore
+
+BATCH_SIZE = 500
+
+
+def open_store(spec, manifest=None):
+    """
+    Return the store for a --store value.
+
+    Args:
+        spec (str): "keyring" or "sqlite:PATH"
+        manifest (None, Manifest): manifest used to list keyring credentials
+    """
+    if spec == "keyring":
+        return KeyringStore(manifest=manifest)
+    if spec.startswith("sqlite:"):
+        return SQLiteStore(spec[len("sqlite:") :])
+    raise click.BadParameter('Must be "keyring" or "sqlite:PATH"', param_hint="--store")
+
+
+def batches(iterable, size=BATCH_SIZE):
+    """Yield lists of up to size items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run_batches(func, items, workers, thread_safe=True):
+    """
+    Call func with each batch of items, spreading batches over a thread pool.
+
+    Returns:
+        list: concatenated results of func for each batch, in order
+    """
+    chunks = list(
+        batches(items, max(1, min(BATCH_SIZE, len(items) // max(workers, 1))))
+    )
+    if workers <= 1 or not thread_safe or len(chunks) <= 1:
+        results = [func(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(func, chunks))
+    return [value for result in results for value in (result or [])]
+
+
+def read_index(path):
+    """Read (service, username) pairs from a file of "service,username" lines."""
+    pairs = set()
+    with open(path) as fh:
+        for line in fh:
+            if line.strip():
+                service, username = [e.strip() for e in line.rsplit(",", 1)]
+                pairs.add((service, username))
+    return sorted(pairs)
+
+
+class Selection:
+    """Credential selection options shared by the list, export and purge commands."""
+
+    def __init__(self, prefix, username, match, index):
+        self.prefix = prefix or ""
+        self.username = username
+        self.match = match
+        self.index = index
+
+    def accepts(self, service, username):
+        if not service.startswith(self.prefix):
+            return False
+        if self.username is not None and username != self.username:
+            return False
+        return self.match is None or fnmatch.fnmatchcase(service, self.match)
+
+    def pairs(self, store):
+        """Return the selected (service, username) pairs."""
+        if self.index:
+            pairs = read_index(self.index)
+        else:
+            pairs = self._unsupported(store.keys, self.prefix)
+        return [p for p in pairs if self.accepts(*p)]
+
+    def items(self, store, workers=1):
+        """Return the selected (service, username, value) items."""
+        if self.index or getattr(store, "manifest", None) is not None:
+            pairs = self.pairs(store)
+            found = run_batches(store.get_many, pairs, workers, store.thread_safe)
+            return [p + (v,) for p, v in zip(pairs, found) if v is not None]
+        items = self._unsupported(store.items, self.prefix)
+        return [i for i in items if self.accepts(i[0], i[1])]
+
+    @staticmethod
+    def _unsupported(func, prefix):
+        try:
+            return func(prefix)
+        except NotImplementedError as ex:
+            raise click.UsageError(
+                "{}. Use --manifest or --index to list credentials.".format(ex)
+            )
+
+
+def selection_options(f):
+    f = click.option(
+        "--index",
+        type=click.Path(exists=True, dir_okay=False),
+        help='File of "service,username" lines for stores that cannot list credentials.',
+    )(f)
+    f = click.option("--match", help="Glob pattern the service name must match.")(f)
+    f = click.option("-u", "--username", help="Only credentials for this username.")(f)
+    f = click.argument("prefix", required=False)(f)
+    return f
+
+
+def bundle_cipher(key):
+    from .crypto import get_cipher, parse_keys
+
+    if not parse_keys(key or ""):
+        raise click.UsageError(
+            'An encryption key is required. Set --key or "CLICK_KEYRING_KEY"'
+        )
+    return get_cipher(key)
+
+
+@click.group()
+@click.version_option(version=__version__)
+@click.option(
+    "--store",
+    default="keyring",
+    show_default=True,
+    help='Credential store: "keyring" or "sqlite:PATH".',
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=int,
+    default=8,
+    show_default=True,
+    help="Threads used for bulk operations when the store allows it.",
+)
+@click.option(
+    "--manifest",
+    "manifest_path",
+    type=click.Path(dir_okay=False),
+    help="Manifest listing keyring credentials. Defaults to manifest.jsonl in the cache dir.",
+)
+@click.option(
+    "--no-manifest",
+    is_flag=True,
+    help="Do not use or update the manifest for the keyring store.",
+)
+@click.pass_context
+def main(ctx, store, workers, manifest_path, no_manifest):
+    """Manage credentials stored by click_keyring."""
+    manifest = None if no_manifest else Manifest(manifest_path)
+    ctx.obj = {"store": open_store(store, manifest), "workers": workers}
+
+
+@main.command("list")
+@selection_options
+@click.pass_obj
+def list_cmd(obj, prefix, username, match, index):
+    """List services and usernames, optionally filtered by PREFIX."""
+    for service, user in Selection(prefix, username, match, index).pairs(obj["store"]):
+        click.echo("{},{}".format(service, user))
+
+
+@main.command()
+@selection_options
+@click.option("-o", "--output", type=click.File("wb"), required=True)
+@click.option("--key", envvar="CLICK_KEYRING_KEY", help="Fernet key for the bundle.")
+@click.pass_obj
+def export(obj, prefix, username, match, index, output, key):
+    """Export credentials to an encrypted bundle."""
+    cipher = bundle_cipher(key)
+    items = Selection(prefix, username, match, index).items(
+        obj["store"], obj["workers"]
+    )
+    data = json.dumps([list(item) for item in items]).encode()
+    output.write(cipher.encrypt(data))
+    click.echo("Exported {} credentials".format(len(items)), err=True)
+
+
+@main.command("import")
+@click.argument("bundle", type=click.File("rb"))
+@click.option("--key", envvar="CLICK_KEYRING_KEY", help="Fernet key for the bundle.")
+@click.pass_obj
+def import_cmd(obj, bundle, key):
+    """Import credentials from an encrypted bundle."""
+    from cryptography.fernet import InvalidToken
+
+    try:
+        items = json.loads(bundle_cipher(key).decrypt(bundle.read()).decode())
+    except InvalidToken:
+        raise click.ClickException("The bundle cannot be decrypted with this key")
+    store = obj["store"]
+    try:
+        run_batches(
+            store.set_many, [tuple(i) for i in items], obj["workers"], store.thread_safe
+        )
+    except StoreError as ex:
+        raise click.ClickException(str(ex))
+    click.echo("Imported {} credentials".format(len(items)), err=True)
+
+
+@main.command()
+@selection_options
+@click.option("--yes", is_flag=True, help="Do not ask for confirmation.")
+@click.option(
+    "--file-cache",
+    "file_cache_path",
+    type=click.Path(dir_okay=False),
+    help="Encrypted file cache to remove the credentials from. Defaults to "
+    "credentials.cache in the cache dir.",
+)
+@click.pass_obj
+def purge(obj, prefix, username, match, index, yes, file_cache_path):
+    """Delete credentials, optionally filtered by PREFIX."""
+    store = obj["store"]
+    pairs = Selection(prefix, username, match, index).pairs(store)
+    if not pairs:
+        click.echo("No credentials found", err=True)
+        return
+    if not yes:
+        click.confirm("Delete {} credentials?".format(len(pairs)), abort=True)
+    # remove cached copies first, a cached value would be saved back to the store
+    file_cache = FileCache(file_cache_path)
+    if os.path.exists(file_cache.path):
+        file_cache.invalidate_many(pairs)
+    try:
+        run_batches(store.delete_many, pairs, obj["workers"], store.thread_safe)
+    except StoreError as ex:
+        raise click.ClickException(str(ex))
+    click.echo("Deleted {} credentials".format(len(pairs)), err=True)
+
+
+@main.command()
+@click.argument("source", type=click.File("r"))
+@click.option("--prefix", required=True, help="Service name prefix.")
+@click.option(
+    "-o",
+    "--other-option",
+    "other_options",
+    multiple=True,
+    help="Row field appended to the service name. May be repeated.",
+)
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(FORMATS),
+    help="Input format. Guessed from the file extension by default.",
+)
+@click.option(
+    "--encrypt", is_flag=True, help="Encrypt passwords like encrypt=True options."
+)
+@click.option(
+    "--service-name", help='Service name template, ex: "{prefix}/{hostname}".'
+)
+@click.option("--chunk-size", type=int, default=BATCH_SIZE, show_default=True)
+@click.option("-q", "--quiet", is_flag=True, help="Do not report progress.")
+@click.pass_obj
+def load(
+    obj, source, prefix, other_options, fmt, encrypt, service_name, chunk_size, quiet
+):
+    """
+    Load credentials from a CSV or JSONL SOURCE file ("-" for stdin).
+
+    Each row needs "username" and "password" fields plus a field for each
+    --other-option. Service names are built as the keyring option would.
+    """
+    from . import KeyRing, EncKeyRing, ServiceNameFormatter
+
+    cls = EncKeyRing if encrypt else KeyRing
+    kr = cls(
+        prefix,
+        other_options=other_options,
+        service_name=ServiceNameFormatter(service_name) if service_name else None,
+        store=obj["store"],
+        manifest=getattr(obj["store"], "manifest", None),
+    )
+
+    def report(state):
+        if not quiet:
+            click.echo(
+                "\r{} credentials, {:.0f}/s".format(state.count, state.rate),
+                err=True,
+                nl=False,
+            )
+
+    rows = read_rows(source, fmt or guess_format(source.name))
+    try:
+        state = import_credentials(rows, kr, chunk_size=chunk_size, progress=report)
+    except (StoreError, KeyError, ValueError) as ex:
+        raise click.ClickException("Import failed: {}".format(ex))
+    click.echo(
+        "{}Loaded {} credentials in {:.1f}s".format(
+            "" if quiet else "\n", state.count, state.elapsed
+        ),
+        err=True,
+    )
+
+
+@main.command()
+@click.option(
+    "-s",
+    "--socket",
+    "path",
+    type=click.Path(dir_okay=False),
+    help="Socket path. Defaults to agent.sock in the click_keyring cache directory.",
+)
+@click.option(
+    "-t",
+    "--lifetime",
+    type=float,
+    default=3600,
+    show_default=True,
+    help="Seconds credentials are held in memory.",
+)
+def agent(path, lifetime):
+    """
+    Run a credential agent on a Unix domain socket.
+
+    Export the printed envvar so click_keyring commands use the agent.
+    """
+    path = os.path.abspath(path or os.path.join(cache_dir(), "agent.sock"))
+    server = Agent(path, lifetime=lifetime)
+    try:
+        server.start()
+    except AgentRunning as ex:
+        raise click.ClickException(str(ex))
+    click.echo("{}={}; export {};".format(AGENT_SOCK_ENVVAR, path, AGENT_SOCK_ENVVAR))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
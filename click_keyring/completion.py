@@ -0,0 +1,103 @@
+"""
+Shell completion support for keyring options.
+
+Shell completion runs the command callbacks with `ctx.resilient_parsing` set
+on every TAB press, so keyring options return immediately without reading the
+backend. Usernames are completed from a small local index file instead, which
+keyring options update when a username is used with a service prefix.
+"""
+
+import os
+import json
+import threading
+from .filecache import cache_dir, locked, atomic_write
+
+
+class UsernameIndex:
+    """
+    Local file listing the usernames used with each service prefix.
+
+    The file holds no passwords. It is only used for shell completion, so
+    read and write errors are ignored.
+
+    Args:
+        path (None, str): index file. Defaults to "usernames.json" in `cache_dir()`
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(cache_dir(), "usernames.json")
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._entries = {}
+
+    def _read(self):
+        """Return the index, reusing the parsed copy if the file is unchanged."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return {}
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if stamp == self._stamp:
+                return self._entries
+        try:
+            with open(self.path, "rb") as fh:
+                entries = json.loads(fh.read().decode())
+        except (OSError, ValueError):
+            entries = {}
+        with self._lock:
+            self._stamp, self._entries = stamp, entries
+        return entries
+
+    def usernames(self, prefix):
+        """Return the usernames known for a service prefix."""
+        return list(self._read().get(prefix, ()))
+
+    def add(self, prefix, username):
+        """Record a username for a service prefix if it is not listed yet."""
+        if not username or username in self._read().get(prefix, ()):
+            return
+        try:
+            with locked(self.path):
+                entries = dict(self._read())
+                entries[prefix] = sorted(set(entries.get(prefix, ())) | {username})
+                atomic_write(self.path, json.dumps(entries).encode())
+        except OSError:
+            pass
+
+    def complete(self, prefix, incomplete):
+        """Return the usernames for prefix starting with `incomplete`."""
+        return [u for u in self.usernames(prefix) if u.startswith(incomplete)]
+
+
+def complete_usernames(ctx, param, incomplete):
+    """
+    Complete a username option from the usernames index of the keyring options.
+
+    Use as `shell_complete` (click 8) or `autocompletion` (click 7) on the
+    option named by the keyring option `user_option`. The keyring backend is
+    never read.
+
+    Args:
+        ctx (click.Context): completion context
+        param (click.Parameter, list): completed option (click 8) or args (click 7)
+        incomplete (str): text typed so far
+
+    Returns:
+        list: matching usernames
+    """
+    from . import KeyRing
+
+    name = getattr(param, "name", None)
+    found = []
+    for option in ctx.command.params:
+        keyring = option.callback
+        if not isinstance(keyring, KeyRing) or keyring.username_index is None:
+            continue
+        if name is not None and keyring.user_option != name:
+            continue
+        prefix = keyring.prefix or ctx.command.name
+        for username in keyring.username_index.complete(prefix, incomplete):
+            if username not in found:
+                found.append(username)
+    return found
@@ -0,0 +1,184 @@
+"""
+Process-wide registry of Fernet ciphers shared by the encrypted keyring options.
+
+A cipher is built once per distinct key list, on first use, so decorating many
+encrypted commands does not import cryptography or build duplicate ciphers.
+
+Several keys may be given, primary key first, to rotate keys. Tokens are
+always encrypted with the primary key and decrypted with any of the keys.
+
+`encrypt_many` and `decrypt_many` spread large batches over a thread or
+process pool. Small batches are handled inline since pool startup would cost
+more than it saves.
+"""
+
+import os
+import itertools
+import threading
+
+_ciphers = {}
+_lock = threading.Lock()
+
+BATCH_THRESHOLD = 256
+
+
+def parse_keys(key):
+    """
+    Normalize key material to a tuple of keys, primary key first.
+
+    Args:
+        key (str, bytes, list, tuple): a key, a comma separated string of keys
+         or a sequence of keys
+
+    Returns:
+        tuple: keys as str
+    """
+    if isinstance(key, bytes):
+        key = key.decode()
+    if isinstance(key, str):
+        key = key.split(",")
+    keys = []
+    for k in key:
+        if isinstance(k, bytes):
+            k = k.decode()
+        k = k.strip()
+        if k:
+            keys.append(k)
+    return tuple(keys)
+
+
+def get_cipher(key):
+    """
+    Return the shared cipher for key, creating it on first use.
+
+    Args:
+        key (str, bytes, list, tuple): key material accepted by `parse_keys`
+
+    Returns:
+        cryptography.fernet.Fernet, cryptography.fernet.MultiFernet: Fernet for a
+         single key or MultiFernet for several keys
+
+    Raises:
+        ValueError: if key contains no keys
+    """
+    keys = parse_keys(key)
+    if not keys:
+        raise ValueError("No Fernet key given")
+    cipher = _ciphers.get(keys)
+    if cipher is None:
+        from cryptography.fernet import Fernet, MultiFernet
+
+        with _lock:
+            cipher = _ciphers.get(keys)
+            if cipher is None:
+                # build the per-key ciphers here, get_cipher would take the lock again
+                fernets = []
+                for k in keys:
+                    fernet = _ciphers.get((k,))
+                    if fernet is None:
+                        fernet = _ciphers[(k,)] = Fernet(k)
+                    fernets.append(fernet)
+                cipher = fernets[0] if len(keys) == 1 else MultiFernet(fernets)
+                _ciphers[keys] = cipher
+    return cipher
+
+
+def decrypt_current(key, token):
+    """
+    Decrypt token and report whether it was encrypted with the primary key.
+
+    Args:
+        key (str, bytes, list, tuple): key material accepted by `parse_keys`
+        token (bytes): Fernet token
+
+    Returns:
+        tuple: (plaintext bytes, True if the primary key encrypted the token)
+    """
+    from cryptography.fernet import InvalidToken
+
+    keys = parse_keys(key)
+    try:
+        return get_cipher(keys[0]).decrypt(token), True
+    except InvalidToken:
+        if len(keys) == 1:
+            raise
+    return get_cipher(keys).decrypt(token), False
+
+
+def invalidate_cipher(key=None):
+    """
+    Remove a cipher from the registry, ex: after rotating the key.
+
+    Args:
+        key (None, str, bytes, list, tuple): key material to remove.
+         If None, all ciphers are removed.
+    """
+    with _lock:
+        if key is None:
+            _ciphers.clear()
+        else:
+            _ciphers.pop(parse_keys(key), None)
+
+
+def _encrypt_chunk(keys, values):
+    cipher = get_cipher(keys)
+    return [cipher.encrypt(value.encode()).decode() for value in values]
+
+
+def _decrypt_chunk(keys, tokens):
+    cipher = get_cipher(keys)
+    return [cipher.decrypt(token.encode()).decode() for token in tokens]
+
+
+def _map_chunks(func, key, values, workers, processes, threshold):
+    keys = parse_keys(key)
+    values = list(values)
+    workers = min(workers or os.cpu_count() or 1, len(values) // max(threshold, 1))
+    if workers <= 1:
+        return func(keys, values)
+
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    size = -(-len(values) // workers)
+    chunks = [values[i : i + size] for i in range(0, len(values), size)]
+    pool_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool_cls(max_workers=len(chunks)) as pool:
+        results = pool.map(func, itertools.repeat(keys), chunks)
+        return list(itertools.chain.from_iterable(results))
+
+
+def encrypt_many(key, values, workers=None, processes=False, threshold=BATCH_THRESHOLD):
+    """
+    Encrypt many strings with the primary key.
+
+    The batch is split into one chunk per worker, with at least `threshold`
+    values per chunk. Batches too small for two chunks are encrypted inline.
+
+    Args:
+        key (str, bytes, list, tuple): key material accepted by `parse_keys`
+        values (iterable): strings to encrypt
+        workers (None, int): maximum number of workers. Defaults to the CPU count
+        processes (bool): use a process pool instead of a thread pool
+        threshold (int): minimum number of values per worker
+
+    Returns:
+        list: Fernet tokens as str, in the same order
+    """
+    return _map_chunks(_encrypt_chunk, key, values, workers, processes, threshold)
+
+
+def decrypt_many(key, tokens, workers=None, processes=False, threshold=BATCH_THRESHOLD):
+    """
+    Decrypt many Fernet tokens with any of the keys.
+
+    Args:
+        key (str, bytes, list, tuple): key material accepted by `parse_keys`
+        tokens (iterable): Fernet tokens as str
+        workers (None, int): maximum number of workers. Defaults to the CPU count
+        processes (bool): use a process pool instead of a thread pool
+        threshold (int): minimum number of tokens per worker
+
+    Returns:
+        list: decrypted strings, in the same order
+    """
+    return _map_chunks(_decrypt_chunk, key, tokens, workers, processes, threshold)
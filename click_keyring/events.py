@@ -0,0 +1,147 @@
+"""
+Observers for credential lookup events.
+
+KeyRing emits the following events, each with a `duration` in seconds:
+
+- "service": service name and username resolved (service, username)
+- "cache_get": value, or a recorded miss, read from the credential cache or
+  the file cache (service, username, source, hit). source is "memory" or "file"
+- "backend_get": value read from the store (service, username, hit)
+- "decrypt": stored value decrypted (service, username)
+- "prompt": password entered at the prompt (service)
+- "save": values written to the backend (count)
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+
+
+class Observer:
+    """
+    Base observer. Subclass and override `emit` to receive events.
+
+    Set `enabled` to False to skip event creation entirely.
+    """
+
+    enabled = True
+
+    def emit(self, event, **data):
+        """
+        Receive an event.
+
+        Args:
+            event (str): event name
+            data (dict): event fields, always including "duration"
+        """
+
+
+class NullObserver(Observer):
+    """Observer that ignores all events. Used by default."""
+
+    enabled = False
+
+
+null_observer = NullObserver()
+
+
+class LoggingObserver(Observer):
+    """
+    Send events to a logging logger.
+
+    Args:
+        log (None, logging.Logger): logger to use, defaults to the "click_keyring" logger
+        level (None, int): logging level for events, defaults to logging.DEBUG
+    """
+
+    def __init__(self, log=None, level=None):
+        import logging
+
+        self.log = log or logging.getLogger("click_keyring")
+        self.level = logging.DEBUG if level is None else level
+
+    def emit(self, event, **data):
+        if not self.log.isEnabledFor(self.level):
+            return
+        fields = " ".join("{}={}".format(k, v) for k, v in sorted(data.items()))
+        self.log.log(self.level, "%s %s", event, fields)
+
+
+class StatsObserver(Observer):
+    """
+    Aggregate event counts, durations and backend hit/miss counters in memory.
+
+    Hits and misses only count "backend_get" events, cache reads are counted
+    under the "cache_get" event.
+
+    Args:
+        buckets (tuple): histogram bucket upper bounds in seconds
+    """
+
+    def __init__(self, buckets=(0.001, 0.01, 0.1, 1.0)):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Remove all collected statistics."""
+        with self._lock:
+            self.counts = defaultdict(int)
+            self.totals = defaultdict(float)
+            self.maximums = defaultdict(float)
+            self.histograms = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+            self.hits = 0
+            self.misses = 0
+
+    def emit(self, event, **data):
+        duration = data.get("duration", 0.0)
+        with self._lock:
+            self.counts[event] += 1
+            self.totals[event] += duration
+            self.maximums[event] = max(self.maximums[event], duration)
+            self.histograms[event][bisect.bisect_left(self.buckets, duration)] += 1
+            if event == "backend_get":
+                if data.get("hit"):
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+    def summary(self):
+        """
+        Return the collected statistics.
+
+        Returns:
+            dict: per event count, total, mean and max durations (seconds) and
+             histogram bucket counts, plus backend hits and misses
+        """
+        with self._lock:
+            events = {}
+            for event, count in self.counts.items():
+                events[event] = {
+                    "count": count,
+                    "total": self.totals[event],
+                    "mean": self.totals[event] / count,
+                    "max": self.maximums[event],
+                    "histogram": list(self.histograms[event]),
+                }
+            return {"events": events, "hits": self.hits, "misses": self.misses}
+
+    def report(self):
+        """Return the statistics formatted as text."""
+        summary = self.summary()
+        lines = [
+            "click_keyring stats (hits: {}, misses: {})".format(
+                summary["hits"], summary["misses"]
+            )
+        ]
+        for event, stats in sorted(summary["events"].items()):
+            lines.append(
+                " - {}: count={} total={:.3f}ms mean={:.3f}ms max={:.3f}ms".format(
+                    event,
+                    stats["count"],
+                    stats["total"] * 1000,
+                    stats["mean"] * 1000,
+                    stats["max"] * 1000,
+                )
+            )
+        return "\n".join(lines)
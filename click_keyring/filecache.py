@@ -0,0 +1,164 @@
+"""
+Encrypted local file cache used as a fast tier in front of slow keyring backends.
+
+All entries are kept in a single file encrypted with Fernet using the same
+key material as `EncKeyRing`. The keyring backend remains the source of truth:
+reads try the file first and writes go through to both.
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+CACHE_DIR_ENVVAR = "CLICK_KEYRING_CACHE_DIR"
+
+
+def cache_dir():
+    """Return the directory used for click_keyring local state files."""
+    default = os.path.join(os.path.expanduser("~"), ".cache", "click_keyring")
+    return os.environ.get(CACHE_DIR_ENVVAR) or default
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold an exclusive lock on `path + ".lock"` while the block runs."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + ".lock", "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def atomic_write(path, data):
+    """Write bytes to path through a temporary file readable only by the owner."""
+    directory = os.path.dirname(os.path.abspath(path))
+    import tempfile
+
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+class FileCache:
+    """
+    Fernet encrypted single file credential cache with per-entry expiry.
+
+    The decrypted entries are kept in memory and only re-read when the
+    file changes, so repeated reads in one process cost a stat call.
+    Unreadable or undecryptable cache files are treated as empty.
+
+    Args:
+        path (None, str): cache file. Defaults to "credentials.cache" in `cache_dir()`
+        ttl (None, float): seconds an entry stays valid. None disables expiry
+        key (None, str): Fernet key material. Defaults to the EncKeyRing key
+    """
+
+    def __init__(self, path=None, ttl=3600, key=None):
+        self.path = path or os.path.join(cache_dir(), "credentials.cache")
+        self.ttl = ttl
+        self.key = key
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._entries = {}
+
+    def _cipher(self):
+        from . import EncKeyRing
+        from .crypto import get_cipher
+
+        if self.key:
+            return get_cipher(self.key)
+        return EncKeyRing().fernet
+
+    @staticmethod
+    def _entry_key(service, username):
+        return "{}\x1f{}".format(service, username)
+
+    def _read(self):
+        """Return entries from the file, reusing the parsed copy if unchanged."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return {}
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if stamp == self._stamp:
+                return self._entries
+        entries = {}
+        if st.st_size:
+            try:
+                import mmap
+
+                with open(self.path, "rb") as fh:
+                    with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        token = mm[:]
+                entries = json.loads(self._cipher().decrypt(token).decode())
+            except Exception:
+                entries = {}
+        with self._lock:
+            self._stamp, self._entries = stamp, entries
+        return entries
+
+    def get(self, service, username):
+        """Return the cached value or None if missing or expired."""
+        entry = self._read().get(self._entry_key(service, username))
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires is not None and expires <= time.time():
+            return None
+        return value
+
+    def set(self, service, username, value):
+        """Add or replace one entry."""
+        self.set_many([(service, username, value)])
+
+    def set_many(self, items):
+        """Add or replace many entries with a single file write."""
+        expires = None if self.ttl is None else time.time() + self.ttl
+        self._update({self._entry_key(s, u): [expires, v] for s, u, v in items})
+
+    def invalidate(self, service, username):
+        """Remove one entry."""
+        self.invalidate_many([(service, username)])
+
+    def invalidate_many(self, pairs):
+        """Remove many entries with a single file write."""
+        self._update({self._entry_key(s, u): None for s, u in pairs})
+
+    def clear(self):
+        """Remove the cache file."""
+        with locked(self.path):
+            with contextlib.suppress(OSError):
+                os.unlink(self.path)
+
+    def _update(self, changes):
+        now = time.time()
+        with locked(self.path):
+            entries = dict(self._read())
+            for key, entry in changes.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+            entries = {k: e for k, e in entries.items() if e[0] is None or e[0] > now}
+            token = self._cipher().encrypt(json.dumps(entries).encode())
+            atomic_write(self.path, token)
@@ -0,0 +1,140 @@
+"""
+Streaming credential import from CSV or JSONL files.
+
+Rows are read with a generator, converted to keyring entries in chunks using
+the service name and encryption logic of a KeyRing or EncKeyRing, and handed
+to a writer thread through a bounded queue. The queue applies backpressure,
+so memory use does not depend on the size of the input file.
+"""
+
+import csv
+import json
+import time
+import queue
+import itertools
+import threading
+
+FORMATS = ("csv", "jsonl")
+
+
+def read_rows(fh, fmt):
+    """
+    Yield rows of a CSV (with a header line) or JSONL file as dicts.
+
+    Args:
+        fh (file): text file object
+        fmt (str): "csv" or "jsonl"
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(fh)
+    elif fmt == "jsonl":
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(
+            'Unknown format "{}". Must be one of: {}'.format(fmt, ", ".join(FORMATS))
+        )
+
+
+def guess_format(filename):
+    """Return the format for a file name extension, defaulting to csv."""
+    return "jsonl" if str(filename).lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+class Progress:
+    """Import progress passed to the progress callback after each written chunk."""
+
+    def __init__(self):
+        self.count = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Credentials written per second."""
+        elapsed = self.elapsed
+        return self.count / elapsed if elapsed else 0.0
+
+
+_DONE = object()
+
+
+def import_credentials(
+    rows,
+    keyring,
+    prefix=None,
+    username_field="username",
+    password_field="password",
+    chunk_size=500,
+    queue_size=4,
+    progress=None,
+):
+    """
+    Write credentials from rows to the store of a KeyRing.
+
+    The service name is built from the prefix and the row values for the
+    KeyRing `other_options`, exactly as the keyring option would build it.
+
+    Args:
+        rows (iterable): dicts with the username, password and other_options fields
+        keyring (KeyRing): KeyRing or EncKeyRing providing the service name
+         format, encryption and store
+        prefix (None, str): service name prefix. Defaults to the KeyRing prefix
+        username_field (str): row field holding the username
+        password_field (str): row field holding the password
+        chunk_size (int): rows converted and written per batch
+        queue_size (int): maximum number of chunks waiting to be written
+        progress (None, callable): called with a Progress after each chunk
+
+    Returns:
+        Progress: final import progress
+    """
+    prefix = prefix or keyring.prefix
+    if not prefix:
+        raise ValueError("A service name prefix is required")
+    state = Progress()
+    chunks = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def writer():
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                return
+            if errors:
+                continue
+            items, options = chunk
+            try:
+                keyring.write_many(items, options)
+            except Exception as ex:
+                errors.append(ex)
+                continue
+            state.count += len(items)
+            if progress is not None:
+                progress(state)
+
+    thread = threading.Thread(target=writer, name="click-keyring-import", daemon=True)
+    thread.start()
+    try:
+        rows = iter(rows)
+        while not errors:
+            batch = list(itertools.islice(rows, chunk_size))
+            if not batch:
+                break
+            options = [{o: row[o] for o in keyring.other_options} for row in batch]
+            services = [
+                keyring.build_service(prefix, list(o.values())) for o in options
+            ]
+            usernames = [row[username_field] for row in batch]
+            values = keyring.encode_many([row[password_field] for row in batch])
+            chunks.put((list(zip(services, usernames, values)), options))
+    finally:
+        chunks.put(_DONE)
+        thread.join()
+    if errors:
+        raise errors[0]
+    return state
@@ -0,0 +1,222 @@
+"""
+Append-only manifest of the credentials written by click_keyring.
+
+Keyring backends cannot list their entries. The manifest records the service
+name, username and other_options values of each saved credential in a local
+JSON lines file, so credentials can be enumerated, queried and purged with one
+file scan. It holds no passwords.
+
+Appends are protected by a file lock. Each process keeps an in-memory index of
+the file and only reads the lines appended since its last read. Once most lines
+are superseded, the file is compacted to one line per credential.
+"""
+
+import os
+import json
+import bisect
+import threading
+from collections import defaultdict, namedtuple
+from .filecache import cache_dir, locked, atomic_write
+
+ManifestEntry = namedtuple("ManifestEntry", "service username options")
+
+
+class Manifest:
+    """
+    Index of saved credentials kept in an append-only JSON lines file.
+
+    Args:
+        path (None, str): manifest file. Defaults to "manifest.jsonl" in `cache_dir()`
+        compact_min (int): minimum number of lines before the file is compacted
+        compact_ratio (float): compact once lines exceed this multiple of the entries
+    """
+
+    def __init__(self, path=None, compact_min=1000, compact_ratio=2.0):
+        self.path = path or os.path.join(cache_dir(), "manifest.jsonl")
+        self.compact_min = compact_min
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._reset(None)
+
+    def _reset(self, inode):
+        self._inode = inode
+        self._offset = 0
+        self._lines = 0
+        self._entries = {}
+        self._by_username = defaultdict(set)
+        self._by_option = defaultdict(set)
+        self._sorted = None
+
+    def _refresh(self):
+        """Apply the lines appended to the file since the last read."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            with self._lock:
+                self._reset(None)
+            return
+        with self._lock:
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._reset(st.st_ino)
+            if st.st_size == self._offset:
+                return
+            with open(self.path, "rb") as fh:
+                fh.seek(self._offset)
+                data = fh.read()
+            # a line being appended by another process is read next time
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                try:
+                    self._apply(json.loads(line.decode()))
+                except ValueError:
+                    continue
+                self._lines += 1
+            self._offset += end
+
+    def _apply(self, record):
+        key = (record["service"], record["username"])
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._by_username[old.username].discard(key)
+            for option in old.options.items():
+                self._by_option[option].discard(key)
+        if old is None or record.get("deleted"):
+            self._sorted = None
+        if record.get("deleted"):
+            return
+        entry = ManifestEntry(key[0], key[1], record.get("options") or {})
+        self._entries[key] = entry
+        self._by_username[entry.username].add(key)
+        for option in entry.options.items():
+            self._by_option[option].add(key)
+
+    @staticmethod
+    def _dump(record):
+        return json.dumps(record, sort_keys=True).encode() + b"\n"
+
+    def _append(self, records):
+        """Append records under the file lock, compacting the file if needed."""
+        with locked(self.path):
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            with os.fdopen(fd, "ab") as fh:
+                fh.write(b"".join(self._dump(r) for r in records))
+            self._refresh()
+            with self._lock:
+                compact = self._lines >= self.compact_min and (
+                    self._lines > self.compact_ratio * len(self._entries)
+                )
+            if compact:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the file with one line per entry. Call with the file lock held."""
+        with self._lock:
+            entries = sorted(self._entries.values())
+        records = [
+            {"service": e.service, "username": e.username, "options": e.options}
+            for e in entries
+        ]
+        atomic_write(self.path, b"".join(self._dump(r) for r in records))
+        self._refresh()
+
+    def compact(self):
+        """Rewrite the file with one line per credential."""
+        with locked(self.path):
+            self._refresh()
+            self._compact()
+
+    def record(self, service, username, options=None):
+        """Record a saved credential. See `record_many`."""
+        self.record_many([(service, username, options)])
+
+    def record_many(self, items):
+        """
+        Record saved credentials.
+
+        Nothing is appended for credentials already recorded with the same
+        options. If options is None, the recorded options are kept.
+
+        Args:
+            items (list): (service, username, options) tuples where options is
+             None or a dict of other_options names and values
+        """
+        self._refresh()
+        records = []
+        with self._lock:
+            for service, username, options in items:
+                entry = self._entries.get((service, username))
+                if options is None:
+                    if entry is not None:
+                        continue
+                    options = {}
+                options = {str(k): str(v) for k, v in options.items()}
+                if entry is not None and entry.options == options:
+                    continue
+                records.append(
+                    {"service": service, "username": username, "options": options}
+                )
+        if records:
+            self._append(records)
+
+    def forget(self, service, username):
+        """Record a deleted credential."""
+        self.forget_many([(service, username)])
+
+    def forget_many(self, pairs):
+        """Record deleted credentials. Pairs that are not recorded are ignored."""
+        self._refresh()
+        with self._lock:
+            records = [
+                {"service": s, "username": u, "deleted": True}
+                for s, u in pairs
+                if (s, u) in self._entries
+            ]
+        if records:
+            self._append(records)
+
+    def _prefix_keys(self, prefix):
+        if self._sorted is None:
+            self._sorted = sorted(self._entries)
+        start = bisect.bisect_left(self._sorted, (prefix,))
+        keys = []
+        for key in self._sorted[start:]:
+            if not key[0].startswith(prefix):
+                break
+            keys.append(key)
+        return keys
+
+    def entries(self, prefix="", username=None, options=None):
+        """
+        Return the recorded credentials matching all of the given filters.
+
+        Args:
+            prefix (str): service name prefix
+            username (None, str): username
+            options (None, dict): other_options names and values
+
+        Returns:
+            list: ManifestEntry tuples sorted by service and username
+        """
+        self._refresh()
+        with self._lock:
+            keys = None
+            if username is not None:
+                keys = set(self._by_username.get(username, ()))
+            for option in (options or {}).items():
+                found = self._by_option.get((str(option[0]), str(option[1])), set())
+                keys = set(found) if keys is None else keys & found
+            if keys is None:
+                keys = self._prefix_keys(prefix)
+            else:
+                keys = sorted(k for k in keys if k[0].startswith(prefix))
+            return [self._entries[k] for k in keys]
+
+    def pairs(self, prefix="", username=None, options=None):
+        """Return (service, username) for the matching credentials. See `entries`."""
+        return [
+            (e.service, e.username) for e in self.entries(prefix, username, options)
+        ]
+
+    def __len__(self):
+        self._refresh()
+        return len(self._entries)
@@ -0,0 +1,79 @@
+"""
+Start keyring lookups in the background while click is still parsing.
+
+`PrefetchCommand` and `PrefetchGroup` predict the service name and username
+of each keyring option as soon as the command line has been split into
+options, using the command line values, envvars, option defaults and the
+context default map. The stored value is then read on a background thread
+while the other options are processed. The keyring option callback joins
+the lookup if its resolved service name and username match the prediction,
+and reads the store itself otherwise.
+"""
+
+import threading
+import click
+
+PREFETCH_META_KEY = "click_keyring.prefetch"
+
+
+def prefetch_credentials(ctx, opts):
+    """
+    Start background lookups for the keyring options of ctx.command.
+
+    Args:
+        ctx (click.Context): context being parsed
+        opts (dict): raw option values from the command line parser
+    """
+    from . import KeyRing
+
+    for param in ctx.command.params:
+        if isinstance(param.callback, KeyRing):
+            param.callback.prefetch(ctx, param, opts)
+
+
+def start_lookup(func, *args):
+    """Run func(*args) in a daemon thread and return a Future for its result."""
+    from concurrent.futures import Future
+
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except BaseException as ex:
+            future.set_exception(ex)
+
+    threading.Thread(target=run, name="click-keyring-prefetch", daemon=True).start()
+    return future
+
+
+class PrefetchMixin:
+    """Command mixin starting keyring lookups once the command line is split."""
+
+    def make_parser(self, ctx):
+        parser = super().make_parser(ctx)
+        parse_args = parser.parse_args
+
+        def parse(args):
+            opts, largs, order = parse_args(args=args)
+            if not ctx.resilient_parsing:
+                prefetch_credentials(ctx, opts)
+            return opts, largs, order
+
+        parser.parse_args = parse
+        return parser
+
+
+class PrefetchCommand(PrefetchMixin, click.Command):
+    """click.Command prefetching the passwords of its keyring options."""
+
+
+class PrefetchGroup(PrefetchMixin, click.Group):
+    """click.Group prefetching the passwords of its keyring options."""
+
+    command_class = PrefetchCommand
+
+
+PrefetchGroup.group_class = PrefetchGroup
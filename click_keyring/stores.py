@@ -0,0 +1,541 @@
+"""
+Credential stores used by KeyRing to read and write stored values.
+
+A store maps (service, username) to a string value. `KeyringStore` wraps the
+keyring module and is the default. `MemoryStore` and `SQLiteStore` can be used
+directly without going through keyring's global backend selection.
+
+Custom stores subclass `CredentialStore` and implement `get`, `set` and
+`delete`. `get_many` and `set_many` may be overridden for cheaper batches and
+`thread_safe` set to False if the store must not be called from several threads.
+"""
+
+import time
+import threading
+
+
+class StoreError(Exception):
+    """Raised by stores when the underlying storage fails."""
+
+
+class StoreUnavailable(StoreError):
+    """Raised when the storage did not answer in time or is skipped by a circuit breaker."""
+
+
+def call_with_deadline(func, args, timeout, lock=None):
+    """
+    Call func(*args), giving up after timeout seconds.
+
+    The call runs in a daemon thread so a hung call does not block the
+    process from exiting. It is abandoned, not interrupted, on timeout.
+
+    With a `lock`, the call holds it until func returns, including after
+    being abandoned, so calls sharing the lock never overlap. Waiting for
+    the lock counts towards the timeout.
+
+    Args:
+        func (callable): function to call
+        args (tuple): positional arguments
+        timeout (None, float): seconds to wait. None waits for the call to return
+        lock (None, threading.Lock): lock held while func runs
+
+    Raises:
+        StoreUnavailable: if the call did not return in time
+    """
+    if timeout is None:
+        if lock is None:
+            return func(*args)
+        with lock:
+            return func(*args)
+    deadline = time.monotonic() + timeout
+    if lock is not None and not lock.acquire(timeout=timeout):
+        raise StoreUnavailable(
+            "Previous call still running after {} seconds".format(timeout)
+        )
+    result = {}
+    done = threading.Event()
+
+    def run():
+        try:
+            result["value"] = func(*args)
+        except BaseException as ex:
+            result["error"] = ex
+        finally:
+            if lock is not None:
+                lock.release()
+            done.set()
+
+    try:
+        threading.Thread(target=run, name="click-keyring-call", daemon=True).start()
+    except BaseException:
+        if lock is not None:
+            lock.release()
+        raise
+    if not done.wait(max(0, deadline - time.monotonic())):
+        raise StoreUnavailable("No answer within {} seconds".format(timeout))
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+class CredentialStore:
+    """Base class for credential stores."""
+
+    thread_safe = True
+
+    def get(self, service, username):
+        """Return the stored value or None if there is none."""
+        raise NotImplementedError
+
+    def set(self, service, username, value):
+        """Store a value."""
+        raise NotImplementedError
+
+    def delete(self, service, username):
+        """Remove a value. Missing values are ignored."""
+        raise NotImplementedError
+
+    def get_many(self, pairs, default=None):
+        """
+        Return the stored values for many (service, username) pairs.
+
+        Values that are missing are returned as None and values that cannot
+        be read as `default`.
+        """
+        values = []
+        for service, username in pairs:
+            try:
+                values.append(self.get(service, username))
+            except StoreError:
+                values.append(default)
+        return values
+
+    def set_many(self, items):
+        """Store many (service, username, value) items."""
+        for service, username, value in items:
+            self.set(service, username, value)
+
+    def delete_many(self, pairs):
+        """Remove many (service, username) pairs."""
+        for service, username in pairs:
+            self.delete(service, username)
+
+    def items(self, prefix=""):
+        """
+        Return (service, username, value) for services starting with prefix.
+
+        Stores that cannot enumerate their entries raise NotImplementedError.
+        """
+        raise NotImplementedError(
+            "{} cannot list credentials".format(type(self).__name__)
+        )
+
+    def keys(self, prefix=""):
+        """Return (service, username) for services starting with prefix."""
+        return [(service, username) for service, username, _ in self.items(prefix)]
+
+    def async_store(self):
+        """
+        Return an object with `aget`/`aset` coroutines if the store is natively
+        async, otherwise None.
+        """
+        if hasattr(self, "aget") and hasattr(self, "aset"):
+            return self
+        return None
+
+
+class _AsyncKeyringBackend:
+    """Adapter for keyring backends providing aget_password/aset_password."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def aget(self, service, username):
+        import keyring
+
+        try:
+            return await self.backend.aget_password(service, username)
+        except keyring.errors.KeyringError as ex:
+            raise StoreError(ex) from ex
+
+    async def aset(self, service, username, value):
+        import keyring
+
+        try:
+            await self.backend.aset_password(service, username, value)
+        except keyring.errors.KeyringError as ex:
+            raise StoreError(ex) from ex
+
+
+class KeyringStore(CredentialStore):
+    """
+    Store backed by the keyring module.
+
+    If `use_agent` is True and the "CLICK_KEYRING_AGENT_SOCK" envvar is set,
+    values are read and written through the credential agent, falling back to
+    keyring if the agent cannot be reached.
+
+    Keyring calls that take longer than `timeout` raise StoreUnavailable. If the
+    backend sets `thread_safe = False`, a timed out call must return before the
+    next one starts. Calls made meanwhile wait for it within their own timeout.
+    With a
+    `breaker`, failed and timed out calls are counted and keyring is skipped
+    while the breaker is open.
+
+    Keyring cannot list its entries. With a `manifest`, writes and deletes are
+    recorded in it and `keys` and `items` list the recorded credentials.
+
+    Args:
+        use_agent (bool): use the credential agent when configured
+        timeout (None, float): seconds to wait for each keyring call
+        breaker (None, CircuitBreaker): circuit breaker for the keyring backend
+        manifest (None, Manifest): index of the credentials written to keyring
+    """
+
+    # keyring has a single backend per process, shared by all stores
+    _backend_lock = threading.Lock()
+
+    def __init__(self, use_agent=True, timeout=None, breaker=None, manifest=None):
+        self.use_agent = use_agent
+        self.timeout = timeout
+        self.breaker = breaker
+        self.manifest = manifest
+
+    def _agent(self):
+        if not self.use_agent:
+            return None
+        from .agent import agent_client
+
+        return agent_client()
+
+    def _call(self, method, *args):
+        from .agent import AgentUnavailable
+        import keyring
+
+        try:
+            client = self._agent()
+            if client is not None:
+                try:
+                    return getattr(client, method)(*args)
+                except AgentUnavailable:
+                    pass
+            return self._call_keyring(method, args)
+        except keyring.errors.KeyringError as ex:
+            raise StoreError(ex) from ex
+
+    def _call_keyring(self, method, args):
+        """Call the keyring module with the deadline and circuit breaker applied."""
+        import keyring
+
+        breaker = self.breaker
+        if breaker is not None and not breaker.allow():
+            raise StoreUnavailable(
+                "Keyring backend unavailable, skipped by circuit breaker"
+            )
+        lock = None
+        if not getattr(keyring.get_keyring(), "thread_safe", True):
+            lock = self._backend_lock
+        try:
+            value = call_with_deadline(
+                getattr(keyring, method), args, self.timeout, lock
+            )
+        except keyring.errors.PasswordDeleteError:
+            raise
+        except (keyring.errors.KeyringError, StoreUnavailable):
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return value
+
+    @property
+    def thread_safe(self):
+        """False if the keyring backend sets `thread_safe = False`."""
+        if self._agent() is not None:
+            return True
+        import keyring
+
+        return getattr(keyring.get_keyring(), "thread_safe", True)
+
+    def get(self, service, username):
+        return self._call("get_password", service, username)
+
+    def set(self, service, username, value):
+        self.set_many([(service, username, value)])
+
+    def set_many(self, items, options=None):
+        """
+        Store many items, recording them in the manifest if there is one.
+
+        Args:
+            items (list): (service, username, value) tuples
+            options (None, list): other_options values dict for each item,
+             recorded in the manifest
+        """
+        items = list(items)
+        options = options or [None] * len(items)
+        done = []
+        try:
+            for (service, username, value), item_options in zip(items, options):
+                self._call("set_password", service, username, value)
+                done.append((service, username, item_options))
+        finally:
+            self._update_manifest("record_many", done)
+
+    def delete(self, service, username):
+        self.delete_many([(service, username)])
+
+    def delete_many(self, pairs):
+        import keyring
+
+        done = []
+        try:
+            for service, username in pairs:
+                try:
+                    self._call("delete_password", service, username)
+                except StoreError as ex:
+                    if not isinstance(ex.__cause__, keyring.errors.PasswordDeleteError):
+                        raise
+                done.append((service, username))
+        finally:
+            self._update_manifest("forget_many", done)
+
+    def _update_manifest(self, method, items):
+        """Update the manifest. Errors are ignored as it is only an index."""
+        if self.manifest is None or not items:
+            return
+        try:
+            getattr(self.manifest, method)(items)
+        except OSError:
+            pass
+
+    def keys(self, prefix=""):
+        if self.manifest is None:
+            return super().keys(prefix)
+        return self.manifest.pairs(prefix)
+
+    def items(self, prefix=""):
+        if self.manifest is None:
+            return super().items(prefix)
+        pairs = self.keys(prefix)
+        values = self.get_many(pairs)
+        return [p + (v,) for p, v in zip(pairs, values) if v is not None]
+
+    def async_store(self):
+        if self._agent() is not None:
+            return None
+        import keyring
+
+        backend = keyring.get_keyring()
+        if hasattr(backend, "aget_password") and hasattr(backend, "aset_password"):
+            return _AsyncKeyringBackend(backend)
+        return None
+
+
+keyring_store = KeyringStore()
+
+
+class MemoryStore(CredentialStore):
+    """Store keeping values in a dict for the life of the process."""
+
+    def __init__(self):
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def get(self, service, username):
+        return self.values.get((service, username))
+
+    def set(self, service, username, value):
+        with self._lock:
+            self.values[(service, username)] = value
+
+    def delete(self, service, username):
+        with self._lock:
+            self.values.pop((service, username), None)
+
+    def set_many(self, items):
+        with self._lock:
+            for service, username, value in items:
+                self.values[(service, username)] = value
+
+    def delete_many(self, pairs):
+        with self._lock:
+            for pair in pairs:
+                self.values.pop(tuple(pair), None)
+
+    def items(self, prefix=""):
+        with self._lock:
+            values = sorted(self.values.items())
+        return [(s, u, v) for (s, u), v in values if s.startswith(prefix)]
+
+
+class SQLiteStore(CredentialStore):
+    """
+    Store keeping values in a SQLite database file.
+
+    Rows hold (service, username, value, updated_at). The primary key on
+    (service, username) indexes lookups by service and by service prefix, so
+    `get` and `items(prefix)` stay O(log n) as the number of credentials grows.
+
+    If `encrypt` is True, values are encrypted with the same Fernet key
+    material as encrypted keyring options before they are written.
+
+    Args:
+        path (str): database file path, or ":memory:"
+        encrypt (bool): encrypt values at rest
+        key (None, str): Fernet key material. Defaults to the EncKeyRing key
+    """
+
+    def __init__(self, path, encrypt=False, key=None):
+        self.path = path
+        self.encrypt = encrypt
+        self.key = key
+        self._lock = threading.RLock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    import sqlite3
+
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    self._create(conn)
+                    self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _create(conn):
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS credentials ("
+                " service TEXT NOT NULL,"
+                " username TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " updated_at REAL,"
+                " PRIMARY KEY (service, username))"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(credentials)")]
+            if "updated_at" not in columns:
+                conn.execute("ALTER TABLE credentials ADD COLUMN updated_at REAL")
+
+    def _cipher(self):
+        if self.key:
+            from .crypto import get_cipher
+
+            return get_cipher(self.key)
+        from . import EncKeyRing
+
+        return EncKeyRing().fernet
+
+    def _dump(self, value):
+        if not self.encrypt:
+            return value
+        return self._cipher().encrypt(value.encode()).decode()
+
+    def _load(self, value):
+        if value is None or not self.encrypt:
+            return value
+        from cryptography.fernet import InvalidToken
+
+        try:
+            return self._cipher().decrypt(value.encode()).decode()
+        except InvalidToken as ex:
+            raise StoreError("Stored value cannot be decrypted") from ex
+
+    def _execute(self, func):
+        import sqlite3
+
+        try:
+            with self._lock:
+                return func(self.conn)
+        except sqlite3.Error as ex:
+            raise StoreError(ex) from ex
+
+    def _select(self, pairs):
+        """Return the stored, still encrypted, values for pairs."""
+        sql = "SELECT value FROM credentials WHERE service = ? AND username = ?"
+
+        def run(conn):
+            rows = [conn.execute(sql, pair).fetchone() for pair in pairs]
+            return [row[0] if row else None for row in rows]
+
+        return self._execute(run)
+
+    def get(self, service, username):
+        return self._load(self._select([(service, username)])[0])
+
+    def get_many(self, pairs, default=None):
+        """
+        Read many values with one connection lock.
+
+        Values that are missing are returned as None. Values that cannot be
+        decrypted, or all values if the database cannot be read, as `default`.
+        """
+        pairs = list(pairs)
+        try:
+            stored = self._select(pairs)
+        except StoreError:
+            return [default] * len(pairs)
+        values = []
+        for value in stored:
+            try:
+                values.append(self._load(value))
+            except StoreError:
+                values.append(default)
+        return values
+
+    def set(self, service, username, value):
+        self.set_many([(service, username, value)])
+
+    def set_many(self, items):
+        """Store many items in one transaction."""
+        sql = (
+            "INSERT OR REPLACE INTO credentials (service, username, value, updated_at)"
+            " VALUES (?, ?, ?, ?)"
+        )
+        now = time.time()
+        rows = [(s, u, self._dump(v), now) for s, u, v in items]
+
+        def run(conn):
+            with conn:
+                conn.executemany(sql, rows)
+
+        self._execute(run)
+
+    def delete(self, service, username):
+        self.delete_many([(service, username)])
+
+    def delete_many(self, pairs):
+        """Remove many values in one transaction."""
+        sql = "DELETE FROM credentials WHERE service = ? AND username = ?"
+        pairs = list(pairs)
+
+        def run(conn):
+            with conn:
+                conn.executemany(sql, pairs)
+
+        self._execute(run)
+
+    def items(self, prefix=""):
+        """
+        Return (service, username, value) for services starting with prefix.
+
+        The prefix is matched with a range scan on the primary key index.
+        """
+        sql = (
+            "SELECT service, username, value FROM credentials"
+            " WHERE service >= ? AND service < ? ORDER BY service, username"
+        )
+        args = (prefix, prefix + "\U0010ffff")
+        rows = self._execute(lambda c: c.execute(sql, args).fetchall())
+        return [(s, u, self._load(v)) for s, u, v in rows]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -32,4 +32,9 @@ setup(
         'cryptography',
         'keyring',
     ],
+    entry_points={
+        'console_scripts': [
+            'click-keyring=click_keyring.cli:main',
+        ],
+    },
 )
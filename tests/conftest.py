@@ -1,3 +1,4 @@
+import os
 import pytest
 import click
 import keyring
@@ -11,8 +12,10 @@ class KrTestBackEnd(keyring.backend.KeyringBackend):
 
     def __init__(self, file):
         self.store = defaultdict(dict)
+        self.writes = 0
 
     def set_password(self, servicename, username, password):
+        self.writes += 1
         self.store[servicename][username] = password
 
     def get_password(self, servicename, username):
@@ -29,10 +32,22 @@ class KrTestBackEnd(keyring.backend.KeyringBackend):
 
 
 @pytest.fixture(name="kr", autouse=True)
-def keyring_backend_fixture(tmpdir):
+def keyring_backend_fixture(tmpdir, monkeypatch):
     file = tmpdir.join()
     keyring.set_keyring(KrTestBackEnd(file))
     assert isinstance(keyring.get_keyring(), KrTestBackEnd)
+    click_keyring.credential_cache.clear()
+    monkeypatch.setenv("CLICK_KEYRING_CACHE_DIR", str(tmpdir.join("cache")))
+
+
+@pytest.fixture(name="fernet_key")
+def fernet_key_fixture():
+    key = "wu3pqWSLYQkDn0kkwUbtu0zhOCCvq4cd5Flm6rMYXIM="
+    existing = os.environ.get("CLICK_KEYRING_KEY", None)
+    os.environ["CLICK_KEYRING_KEY"] = key
+    yield key
+    if existing:
+        os.environ["CLICK_KEYRING_KEY"] = existing
 
 
 def format_input(*args):
@@ -0,0 +1,108 @@
+import threading
+import pytest
+import keyring
+from click.testing import CliRunner
+from click_keyring.agent import Agent, AgentClient, AgentRunning, AGENT_SOCK_ENVVAR
+from click_keyring.cli import main
+from .conftest import make_cli, format_result
+
+
+USER = "testuser"
+PW = "testpw"
+
+
+@pytest.fixture(name="agent")
+def agent_fixture(tmp_path, monkeypatch):
+    path = str(tmp_path / "agent.sock")
+    server = Agent(path)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv(AGENT_SOCK_ENVVAR, path)
+    yield server
+    server.shutdown()
+    thread.join()
+
+
+def test_agent_client_round_trip(agent):
+    """
+    Given a running agent
+    When a password is set and read with the client
+    Then the agent saves it to keyring, serves it from memory and
+    relays backend errors
+    """
+    client = AgentClient(agent.path)
+    assert client.ping() == "pong"
+    client.set_password("svc", USER, PW)
+    assert keyring.get_password("svc", USER) == PW
+
+    keyring.get_keyring().store.clear()
+    assert client.get_password("svc", USER) == PW
+    with pytest.raises(keyring.errors.KeyringError):
+        client.get_password("missing", USER)
+
+
+def test_keyring_option_uses_agent(agent):
+    """
+    Given a running agent and the agent envvar set
+    When a command saves a password and is invoked again
+    Then the password is served by the agent
+    """
+    runner = CliRunner()
+    cli = make_cli()
+    runner.invoke(cli, args=["-u", USER, "-p", PW])
+    assert (cli.name, USER) in agent._entries
+
+    keyring.get_keyring().store.clear()
+    result = runner.invoke(cli, args=["-u", USER])
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
+
+
+def test_keyring_option_falls_back_without_agent(tmp_path, monkeypatch):
+    """
+    Given the agent envvar points at a socket that does not exist
+    When a command saves a password
+    Then the password is saved to keyring directly
+    """
+    monkeypatch.setenv(AGENT_SOCK_ENVVAR, str(tmp_path / "missing.sock"))
+    runner = CliRunner()
+    cli = make_cli()
+    result = runner.invoke(cli, args=["-u", USER, "-p", PW])
+    assert result.exit_code == 0
+    assert keyring.get_password(cli.name, USER) == PW
+
+
+def test_agent_does_not_replace_running_agent(agent, tmp_path):
+    """
+    Given a running agent
+    When a second agent is started on the same socket path
+    Then it refuses and the running agent keeps answering
+    """
+    with pytest.raises(AgentRunning):
+        Agent(agent.path).start()
+    assert AgentClient(agent.path).ping() == "pong"
+
+    result = CliRunner().invoke(main, ["agent", "-s", agent.path])
+    assert result.exit_code == 1
+    assert "already running" in result.output
+
+
+def test_agent_replaces_stale_socket(tmp_path):
+    """
+    Given a socket file left by an agent that exited
+    When an agent is started on that path
+    Then the stale file is replaced
+    """
+    path = str(tmp_path / "agent.sock")
+    stale = Agent(path)
+    stale.start()
+    stale._server.server_close()
+
+    server = Agent(path)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    assert AgentClient(path).ping() == "pong"
+    server.shutdown()
+    thread.join()
@@ -0,0 +1,134 @@
+import asyncio
+import click
+import keyring
+import click_keyring
+from click_keyring import MemoryStore
+from click_keyring.aio import AsyncKeyRing, AsyncEncKeyRing
+from cryptography.fernet import Fernet
+from .conftest import KrTestBackEnd, make_cli
+
+
+USER = "testuser"
+PW = "testpw"
+
+
+class AsyncBackEnd(KrTestBackEnd):
+    def __init__(self):
+        super().__init__(None)
+        self.async_calls = 0
+
+    async def aget_password(self, servicename, username):
+        self.async_calls += 1
+        await asyncio.sleep(0)
+        return self.get_password(servicename, username)
+
+    async def aset_password(self, servicename, username, password):
+        self.async_calls += 1
+        self.set_password(servicename, username, password)
+
+
+def run(coro):
+    """Run a coroutine to completion. asyncio.run requires Python 3.7."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def make_context(cli, **params):
+    ctx = click.Context(cli)
+    ctx.params.update(params)
+    return ctx
+
+
+def test_async_callback_saves_and_reads():
+    """
+    Given an async keyring callback
+    When it is awaited with a password and then without one
+    Then the password is saved and read back through the executor
+    """
+    cli = make_cli()
+    kr = AsyncKeyRing(None)
+    ctx = make_context(cli, username=USER)
+
+    assert run(kr(ctx, None, PW)) == PW
+    assert keyring.get_password(cli.name, USER) == PW
+    assert run(kr(ctx, None, None)) == PW
+
+
+def test_async_gather_many_with_native_backend(fernet_key):
+    """
+    Given a natively async keyring backend with encrypted credentials
+    When many credentials are fetched with afetch_many
+    Then the backend coroutines are awaited and the passwords decrypted
+    """
+    backend = AsyncBackEnd()
+    keyring.set_keyring(backend)
+    f = Fernet(fernet_key)
+    for i in range(3):
+        backend.set_password("svc{}".format(i), USER, f.encrypt(b"pw%d" % i).decode())
+    kr = AsyncEncKeyRing("svc", "username")
+
+    result = run(kr.afetch_many([("svc{}".format(i), USER) for i in range(4)]))
+
+    assert result == ["pw0", "pw1", "pw2", None]
+    assert backend.async_calls == 4
+
+
+def test_async_native_backend_caches_misses():
+    """
+    Given a cached async keyring with a natively async backend
+    When a missing credential is fetched twice
+    Then the backend is only awaited once
+    """
+    class MissingBackEnd(AsyncBackEnd):
+        def get_password(self, servicename, username):
+            return None
+
+    backend = MissingBackEnd()
+    keyring.set_keyring(backend)
+    kr = AsyncKeyRing("svc", cache=True)
+
+    assert run(kr.afetch("svc", USER)) is None
+    assert run(kr.afetch("svc", USER)) is None
+    assert backend.async_calls == 1
+
+
+def test_keyring_option_asynchronous():
+    """
+    Given a keyring option created with asynchronous=True
+    When the option callback is inspected
+    Then it is an async KeyRing
+    """
+    cli = make_cli({"asynchronous": True})
+    param = [p for p in cli.params if p.name == "password"][0]
+    assert isinstance(param.callback, AsyncKeyRing)
+    assert isinstance(param.callback, click_keyring.KeyRing)
+
+
+def test_async_callback_shares_and_applies_write_policy():
+    """
+    Given an async keyring callback with the on-change write policy
+    When it is awaited twice in one invocation
+    Then the second call is answered by the shared password and nothing is saved
+    """
+    class CountingStore(MemoryStore):
+        reads = writes = 0
+
+        def get(self, service, username):
+            self.reads += 1
+            return super().get(service, username)
+
+        def set_many(self, items):
+            self.writes += 1
+            super().set_many(items)
+
+    store = CountingStore()
+    store.set("svc", USER, PW)
+    kr = AsyncKeyRing("svc", store=store, write="on-change")
+    ctx = make_context(make_cli(), username=USER)
+
+    assert run(kr(ctx, None, None)) == PW
+    assert run(kr(ctx, None, PW)) == PW
+    assert (store.reads, store.writes) == (1, 0)
@@ -0,0 +1,167 @@
+import keyring
+import click_keyring
+from click.testing import CliRunner
+from click_keyring import CredentialCache
+from .conftest import make_cli, format_result
+
+
+USER = "testuser"
+PW = "testpw"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_expires_entries():
+    """
+    Given a cache with a ttl
+    When an entry is read after the ttl elapsed
+    Then the entry is reported missing
+    """
+    clock = FakeClock()
+    cache = CredentialCache(ttl=10, clock=clock)
+    cache.set("svc", USER, PW)
+    clock.now = 9
+    assert cache.get("svc", USER) == PW
+    clock.now = 10
+    assert cache.get("svc", USER) is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    Given a cache limited to two entries
+    When a third entry is added after reading the first
+    Then the least recently used entry is evicted
+    """
+    cache = CredentialCache(maxsize=2)
+    cache.set("svc1", USER, "pw1")
+    cache.set("svc2", USER, "pw2")
+    cache.get("svc1", USER)
+    cache.set("svc3", USER, "pw3")
+    assert ("svc1", USER) in cache
+    assert ("svc2", USER) not in cache
+    assert ("svc3", USER) in cache
+
+
+def test_cache_invalidate():
+    """
+    Given a cache holding several users for one service
+    When the service is invalidated with and without a username
+    Then only the matching entries are removed
+    """
+    cache = CredentialCache()
+    cache.set("svc", "user1", "pw1")
+    cache.set("svc", "user2", "pw2")
+    cache.set("other", "user1", "pw3")
+    cache.invalidate("svc", "user1")
+    assert cache.get("svc", "user1") is None
+    assert cache.get("svc", "user2") == "pw2"
+    cache.invalidate("svc")
+    assert len(cache) == 1
+
+
+def test_keyring_option_cache_skips_backend(monkeypatch):
+    """
+    Given a cached click command that already saved a password
+    When the command is invoked again
+    Then the password is served from the cache without a backend read
+    """
+    runner = CliRunner()
+    cli = make_cli({"cache": True})
+    runner.invoke(cli, args=["-u", USER, "-p", PW])
+
+    def fail(*args):
+        raise AssertionError("backend read")
+
+    monkeypatch.setattr(keyring, "get_password", fail)
+    result = runner.invoke(cli, args=["-u", USER])
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
+
+
+def test_keyring_option_cache_not_poisoned_by_errors(monkeypatch):
+    """
+    Given a cached click command and a failing keyring backend
+    When the command is invoked
+    Then nothing is added to the cache
+    """
+    def fail(*args):
+        raise keyring.errors.KeyringError("locked")
+
+    monkeypatch.setattr(keyring, "get_password", fail)
+    monkeypatch.setattr(keyring, "set_password", fail)
+    runner = CliRunner()
+    cli = make_cli({"cache": True})
+    result = runner.invoke(cli, args=["-u", USER], input=PW)
+    assert result.exit_code != 0
+    assert len(click_keyring.credential_cache) == 0
+
+
+def test_cache_remembers_missing_entries():
+    """
+    Given a cache with a negative ttl
+    When a missing entry is recorded
+    Then it is reported missing until the negative ttl elapsed or a value is set
+    """
+    clock = FakeClock()
+    cache = CredentialCache(ttl=100, clock=clock, negative_ttl=5)
+    cache.set_missing("svc", USER)
+    assert cache.is_missing("svc", USER)
+    assert cache.get("svc", USER) is None
+    clock.now = 5
+    assert not cache.is_missing("svc", USER)
+
+    cache.set_missing("svc", USER)
+    cache.set("svc", USER, PW)
+    assert not cache.is_missing("svc", USER)
+    assert cache.get("svc", USER) == PW
+
+
+def test_cached_option_skips_backend_for_missing_entry():
+    """
+    Given a cached keyring option and no saved password
+    When the password is looked up twice
+    Then the store is only read once
+    """
+    reads = []
+
+    class CountingStore(click_keyring.MemoryStore):
+        def get(self, service, username):
+            reads.append(service)
+            return super().get(service, username)
+
+    kr = click_keyring.KeyRing("missing", cache=True, store=CountingStore())
+    assert kr.fetch("missing", USER) is None
+    assert kr.fetch("missing", USER) is None
+    assert reads == ["missing"]
+
+
+def test_cached_option_caches_batch_misses_but_not_errors():
+    """
+    Given a cached keyring option and a store failing for one credential
+    When several credentials are looked up as a batch twice
+    Then the missing credential is read once and the failing one each time
+    """
+    reads = []
+
+    class FlakyStore(click_keyring.MemoryStore):
+        def get(self, service, username):
+            reads.append(service)
+            if service == "broken":
+                raise click_keyring.StoreError("unavailable")
+            return super().get(service, username)
+
+    store = FlakyStore()
+    store.set("present", USER, PW)
+    kr = click_keyring.KeyRing("batch", cache=True, store=store)
+    pairs = [("present", USER), ("absent", USER), ("broken", USER)]
+
+    assert kr.fetch_many(pairs) == [PW, None, None]
+    assert kr.fetch_many(pairs) == [PW, None, None]
+    assert reads == ["present", "absent", "broken", "broken"]
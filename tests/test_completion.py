@@ -0,0 +1,56 @@
+import click
+import click_keyring
+from click.testing import CliRunner
+from click.shell_completion import ShellComplete
+from click_keyring import UsernameIndex, complete_usernames, keyring_option
+
+PW = "testpw"
+
+
+class FailingStore(click_keyring.CredentialStore):
+    def get(self, service, username):
+        raise AssertionError("store read during completion")
+
+    def set(self, service, username, value):
+        raise AssertionError("store write during completion")
+
+
+def make_cli(store=None, index=None):
+    @keyring_option("-p", "--password", prefix="comp", store=store, username_index=index)
+    @click.option("-u", "--username", shell_complete=complete_usernames)
+    @click.command(name="cli")
+    def cli(username, password):
+        click.echo("{}|{}".format(username, password))
+
+    return cli
+
+
+def completions(cli, args, incomplete):
+    return [c.value for c in ShellComplete(cli, {}, "cli", "_CLI_COMPLETE").get_completions(args, incomplete)]
+
+
+def test_resilient_parsing_skips_backend():
+    """
+    Given a keyring option whose store fails on any access
+    When the command is parsed with resilient parsing, as shell completion does
+    Then the store is not used and no prompt is shown
+    """
+    cli = make_cli(store=FailingStore())
+    ctx = cli.make_context("cli", ["-u", "testuser"], resilient_parsing=True)
+    assert ctx.params["password"] is None
+
+
+def test_username_completion_from_index(tmp_path):
+    """
+    Given a keyring option recording usernames in an index
+    When commands run with several usernames and a username is completed
+    Then the recorded usernames matching the incomplete text are returned
+    """
+    index = UsernameIndex(str(tmp_path / "usernames.json"))
+    cli = make_cli(store=click_keyring.MemoryStore(), index=index)
+    runner = CliRunner()
+    for username in ("alice", "albert", "bob"):
+        assert runner.invoke(cli, ["-u", username, "-p", PW]).exit_code == 0
+
+    assert index.usernames("comp") == ["albert", "alice", "bob"]
+    assert completions(cli, ["-u"], "al") == ["albert", "alice"]
@@ -0,0 +1,98 @@
+import logging
+import keyring
+from click.testing import CliRunner
+from click_keyring import StatsObserver, LoggingObserver, credential_cache, keyring_stats_option
+from .conftest import make_cli, format_result
+
+
+USER = "testuser"
+PW = "testpw"
+
+
+def test_stats_observer_collects_events(fernet_key):
+    """
+    Given an encrypted command with a stats observer
+    When the command is invoked cold and then warm
+    Then backend hits, misses and event timings are collected
+    """
+    observer = StatsObserver()
+    runner = CliRunner()
+    cli = make_cli({"encrypt": True, "observer": observer})
+
+    runner.invoke(cli, args=["-u", USER], input=PW)
+    result = runner.invoke(cli, args=["-u", USER])
+
+    assert format_result(USER, PW) in result.output
+    summary = observer.summary()
+    assert (summary["hits"], summary["misses"]) == (1, 1)
+    events = summary["events"]
+    assert events["backend_get"]["count"] == 2
+    assert events["prompt"]["count"] == 1
+    assert events["decrypt"]["count"] == 1
+    assert events["save"]["count"] == 2
+    assert events["service"]["count"] == 2
+    assert sum(events["save"]["histogram"]) == 2
+
+
+def test_logging_observer(caplog):
+    """
+    Given a command with a logging observer
+    When the command is invoked
+    Then the events are logged
+    """
+    runner = CliRunner()
+    cli = make_cli({"observer": LoggingObserver()})
+    with caplog.at_level(logging.DEBUG, logger="click_keyring"):
+        runner.invoke(cli, args=["-u", USER, "-p", PW])
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith("save ") for m in messages)
+    assert any(m.startswith("service ") for m in messages)
+
+
+def test_keyring_stats_option():
+    """
+    Given a command with a hidden keyring stats flag
+    When the command is invoked with the flag
+    Then the statistics are printed and the flag is hidden from help
+    """
+    observer = StatsObserver()
+    keyring.set_password("stats", USER, PW)
+
+    cli = make_cli({"prefix": "stats", "observer": observer})
+    cli = keyring_stats_option(observer)(cli)
+    runner = CliRunner(mix_stderr=False)
+
+    result = runner.invoke(cli, args=["-u", USER, "--keyring-stats"])
+    assert result.exit_code == 0
+    assert "click_keyring stats (hits: 1, misses: 0)" in result.stderr
+    assert "--keyring-stats" not in runner.invoke(cli, args=["--help"]).output
+
+
+def test_stats_observer_separates_cache_reads(fernet_key):
+    """
+    Given a command with the credential cache, a file cache and a stats observer
+    When the command is invoked three times after clearing the memory cache once
+    Then cache reads are reported as cache_get events by source and
+    only store reads count as backend hits and misses
+    """
+    class RecordingObserver(StatsObserver):
+        def emit(self, event, **data):
+            events.append((event, data.get("source")))
+            super().emit(event, **data)
+
+    events = []
+    observer = RecordingObserver()
+    runner = CliRunner()
+    cli = make_cli({"cache": True, "file_cache": True, "observer": observer})
+
+    runner.invoke(cli, args=["-u", USER], input=PW)
+    runner.invoke(cli, args=["-u", USER])
+    credential_cache.clear()
+    result = runner.invoke(cli, args=["-u", USER])
+
+    assert format_result(USER, PW) in result.output
+    reads = [e for e in events if e[0].endswith("_get")]
+    assert reads == [("backend_get", None), ("cache_get", "memory"), ("cache_get", "file")]
+    summary = observer.summary()
+    assert (summary["hits"], summary["misses"]) == (0, 1)
+    assert summary["events"]["cache_get"]["count"] == 2
@@ -0,0 +1,74 @@
+import keyring
+from click.testing import CliRunner
+from click_keyring import FileCache
+from .conftest import make_cli, format_result
+
+
+USER = "testuser"
+PW = "testpw"
+
+
+def test_file_cache_shared_between_instances(tmpdir, fernet_key):
+    """
+    Given a file cache written by one instance
+    When another instance reads the same file
+    Then the entries are found and the file is not plaintext
+    """
+    path = str(tmpdir.join("creds.cache"))
+    FileCache(path).set_many([("svc1", USER, "pw1"), ("svc2", USER, "pw2")])
+
+    cache = FileCache(path)
+    assert cache.get("svc1", USER) == "pw1"
+    assert cache.get("svc2", USER) == "pw2"
+    assert cache.get("svc3", USER) is None
+    with open(path, "rb") as fh:
+        assert b"pw1" not in fh.read()
+
+
+def test_file_cache_expiry_and_invalidate(tmpdir, fernet_key):
+    """
+    Given file cache entries
+    When an entry expires or is invalidated
+    Then it is no longer returned
+    """
+    path = str(tmpdir.join("creds.cache"))
+    FileCache(path, ttl=-1).set("expired", USER, PW)
+    cache = FileCache(path)
+    assert cache.get("expired", USER) is None
+    cache.set("svc", USER, PW)
+    cache.invalidate("svc", USER)
+    assert FileCache(path).get("svc", USER) is None
+
+
+def test_file_cache_ignores_corrupt_file(tmpdir, fernet_key):
+    """
+    Given a corrupt cache file
+    When it is read and then written
+    Then it is treated as empty and replaced
+    """
+    path = tmpdir.join("creds.cache")
+    path.write("not a fernet token")
+    cache = FileCache(str(path))
+    assert cache.get("svc", USER) is None
+    cache.set("svc", USER, PW)
+    assert FileCache(str(path)).get("svc", USER) == PW
+
+
+def test_keyring_option_file_cache_tier(tmpdir, fernet_key, monkeypatch):
+    """
+    Given a command with a file cache that saved a password
+    When a new process reads the password with a failing keyring backend
+    Then the password is served from the file cache
+    """
+    path = str(tmpdir.join("creds.cache"))
+    runner = CliRunner()
+    runner.invoke(make_cli({"file_cache": FileCache(path)}), args=["-u", USER, "-p", PW])
+
+    def fail(*args):
+        raise AssertionError("backend read")
+
+    monkeypatch.setattr(keyring, "get_password", fail)
+    cli = make_cli({"file_cache": FileCache(path), "write": "on-change"})
+    result = runner.invoke(cli, args=["-u", USER])
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
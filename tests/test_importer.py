@@ -0,0 +1,97 @@
+import io
+import json
+import keyring
+from click.testing import CliRunner
+from click_keyring import KeyRing, EncKeyRing, Manifest, MemoryStore
+from click_keyring.importer import import_credentials, read_rows
+from click_keyring.cli import main
+
+
+def make_rows(count):
+    for i in range(count):
+        yield {"hostname": "host{}".format(i), "username": "user", "password": "pw{}".format(i)}
+
+
+def test_import_streams_rows_in_chunks():
+    """
+    Given a generator of credential rows
+    When they are imported with a small chunk size
+    Then every credential is written with the keyring option service names
+    """
+    store = MemoryStore()
+    kr = KeyRing("fleet", other_options=("hostname",), store=store)
+    reports = []
+
+    state = import_credentials(make_rows(25), kr, chunk_size=10, progress=lambda s: reports.append(s.count))
+
+    assert state.count == 25
+    assert reports == [10, 20, 25]
+    assert store.get("fleethost7", "user") == "pw7"
+
+
+def test_import_encrypted(fernet_key):
+    """
+    Given an EncKeyRing
+    When credentials are imported
+    Then they are encrypted and readable by the keyring option
+    """
+    store = MemoryStore()
+    kr = EncKeyRing("fleet", other_options=("hostname",), store=store)
+    import_credentials(make_rows(3), kr)
+    assert store.get("fleethost1", "user").startswith("gAAAA")
+    assert kr.fetch("fleethost1", "user") == "pw1"
+
+
+def test_import_records_manifest(tmp_path):
+    """
+    Given a KeyRing with a manifest
+    When credentials are imported
+    Then each credential is recorded with its other_options values
+    """
+    manifest = Manifest(str(tmp_path / "manifest.jsonl"))
+    kr = KeyRing("fleet", other_options=("hostname",), store=MemoryStore(), manifest=manifest)
+    import_credentials(make_rows(3), kr)
+    assert manifest.pairs(options={"hostname": "host2"}) == [("fleethost2", "user")]
+    assert len(manifest) == 3
+
+
+def test_read_rows_formats():
+    """
+    Given CSV and JSONL input
+    When rows are read
+    Then both produce the same dicts
+    """
+    csv_text = "hostname,username,password\nh1,u,p1\n"
+    jsonl_text = json.dumps({"hostname": "h1", "username": "u", "password": "p1"}) + "\n\n"
+    expected = [{"hostname": "h1", "username": "u", "password": "p1"}]
+    assert [dict(r) for r in read_rows(io.StringIO(csv_text), "csv")] == expected
+    assert list(read_rows(io.StringIO(jsonl_text), "jsonl")) == expected
+
+
+def test_load_command(tmp_path):
+    """
+    Given a CSV file of credentials
+    When the load command runs against keyring
+    Then the credentials are saved to keyring
+    """
+    source = tmp_path / "creds.csv"
+    source.write_text("hostname,username,password\nh1,u,p1\nh2,u,p2\n")
+    runner = CliRunner()
+    result = runner.invoke(main, ["load", str(source), "--prefix", "fleet", "-o", "hostname"])
+    assert result.exit_code == 0
+    assert "Loaded 2 credentials" in result.output
+    assert keyring.get_password("fleeth2", "u") == "p2"
+
+
+def test_load_command_missing_field(tmp_path):
+    """
+    Given a CSV file without a field required for the service name
+    When the load command runs
+    Then it fails with an error
+    """
+    source = tmp_path / "creds.csv"
+    source.write_text("username,password\nu,p1\n")
+    runner = CliRunner()
+    result = runner.invoke(main, ["load", str(source), "--prefix", "fleet", "-o", "hostname"])
+    assert result.exit_code != 0
+    assert "Import failed" in result.output
@@ -1,4 +1,5 @@
-import os
+import time
+import threading
 import pytest
 import click
 import keyring
@@ -42,6 +43,7 @@ def populate_keyring_fixture():
     cli = make_cli()
     keyring.set_password(cli.name, USER, PW)
     assert keyring.get_password(cli.name, USER) == PW
+    keyring.get_keyring().writes = 0
 
 
 def test_password_get(populate_keyring):
@@ -94,16 +96,6 @@ def test_keyring_using_custom_prefix():
     assert keyring.get_password(prefix, USER) == PW
 
 
-@pytest.fixture(name="fernet_key")
-def fernet_key_fixture():
-    key = "wu3pqWSLYQkDn0kkwUbtu0zhOCCvq4cd5Flm6rMYXIM="
-    existing = os.environ.get("CLICK_KEYRING_KEY", None)
-    os.environ["CLICK_KEYRING_KEY"] = key
-    yield key
-    if existing:
-        os.environ["CLICK_KEYRING_KEY"] = existing
-
-
 def test_keyring_password_encrypt(fernet_key):
     """
     Given a click command with a custom service prefix set for click_keyring
@@ -117,3 +109,481 @@ def test_keyring_password_encrypt(fernet_key):
     assert result.exit_code == 0
     enc_pw = keyring.get_password(cli.name, USER).encode()
     assert Fernet(fernet_key).decrypt(enc_pw).decode() == PW
+
+
+@pytest.mark.parametrize("write, expected_writes", [
+    ("always", 1),
+    ("on-change", 0),
+    ("never", 0),
+])
+def test_write_policy_warm_invocation(populate_keyring, write, expected_writes):
+    """
+    Given a click command for a username already saved to the keyring store
+    When the command is invoked with each write policy
+    Then the keyring is only written to when the policy requires it
+    """
+    runner = CliRunner()
+    cli = make_cli({"write": write})
+    result = runner.invoke(cli, args=["-u", USER])
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
+    assert keyring.get_keyring().writes == expected_writes
+
+
+def test_write_policy_on_change_saves_new_password(populate_keyring):
+    """
+    Given a click command using the "on-change" write policy
+    When the command is invoked with a password that differs from the saved one
+    Then the new password is saved to the keyring
+    """
+    runner = CliRunner()
+    cli = make_cli({"write": "on-change"})
+    result = runner.invoke(cli, args=["-u", USER, "-p", "newpw"])
+    assert result.exit_code == 0
+    assert keyring.get_keyring().writes == 1
+    assert keyring.get_password(cli.name, USER) == "newpw"
+
+
+def test_write_policy_on_change_encrypted(fernet_key):
+    """
+    Given an encrypted click command using the "on-change" write policy
+    When the command is invoked a second time without a password
+    Then the decrypted password matches and the keyring is not written again
+    """
+    runner = CliRunner()
+    cli = make_cli({"encrypt": True, "write": "on-change"})
+    runner.invoke(cli, args=["-u", USER, "-p", PW])
+    assert keyring.get_keyring().writes == 1
+    result = runner.invoke(cli, args=["-u", USER])
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
+    assert keyring.get_keyring().writes == 1
+
+
+def test_write_policy_invalid():
+    """
+    Given an unknown write policy
+    When the keyring option is created
+    Then a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        click_keyring.keyring_option(write="sometimes")
+
+
+def test_option_plan_cached_per_command():
+    """
+    Given a click command with keyring options
+    When the option plan is requested repeatedly and the params then change
+    Then the plan is reused until the params change and rebuilt afterwards
+    """
+    cli = make_cli()
+    plan = click_keyring.option_plan(cli)
+    assert click_keyring.option_plan(cli) is plan
+    assert set(plan.params) == {"username", "other", "password"}
+
+    cli.params.append(click.Option(["--extra"]))
+    rebuilt = click_keyring.option_plan(cli)
+    assert rebuilt is not plan
+    assert "extra" in rebuilt.params
+
+
+def test_service_resolved_once_per_invocation(monkeypatch):
+    """
+    Given a click command with other_options
+    When the command is invoked without a password
+    Then the service name is only built once
+    """
+    calls = []
+    service = click_keyring.KeyRing.service
+
+    def counting_service(self, ctx):
+        calls.append(ctx)
+        return service(self, ctx)
+
+    monkeypatch.setattr(click_keyring.KeyRing, "service", counting_service)
+    runner = CliRunner()
+    cli = make_cli({"other_options": ("other",)})
+    result = runner.invoke(cli, args=["-u", USER], input=PW)
+    assert result.exit_code == 0
+    assert len(calls) == 1
+
+
+def test_service_name_formatter_template_and_normalize():
+    """
+    Given a service name formatter with a template and normalization
+    When names are built for option values
+    Then the values are normalized, the template is kept and results are memoized
+    """
+    fmt = click_keyring.ServiceNameFormatter("{prefix}/{hostname}", normalize=True)
+    options = (("hostname", "host-1.example.com"),)
+    assert fmt("fleet_scan", options) == "fleetscan/host1examplecom"
+    assert fmt("fleet_scan", options) == "fleetscan/host1examplecom"
+    info = fmt.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_keyring_using_service_name_template():
+    """
+    Given a click command with a service name template
+    When the command is invoked
+    Then the password is saved using the templated service name
+    """
+    runner = CliRunner()
+    cli = make_cli({"other_options": ("other",), "service_name": "{prefix}/{other}"})
+
+    result = runner.invoke(cli, args=["-u", USER, "-o", "other_value", "-p", PW])
+
+    assert result.exit_code == 0
+    assert keyring.get_password("cli/other_value", USER) == PW
+
+
+def make_hosts_cli(keyring_opts=None):
+    keyring_opts = dict(keyring_opts or {}, other_options=("hostname",))
+
+    @click_keyring.keyring_option("-p", "--password", **keyring_opts)
+    @click.option("-n", "--hostname", multiple=True)
+    @click.option("-u", "--username")
+    @click.command(name="hosts")
+    def cli(username, hostname, password):
+        for host in hostname:
+            click.echo("{}={}".format(host, password[host]))
+
+    return cli
+
+
+def test_bulk_resolution_prompts_only_missing():
+    """
+    Given a command with a multi-valued hostname option and one host saved
+    When the command is invoked for two hosts
+    Then only the missing host is prompted for and saved
+    """
+    keyring.set_password("hostshost1", USER, "pw1")
+    keyring.get_keyring().writes = 0
+    runner = CliRunner()
+    cli = make_hosts_cli({"write": "on-change"})
+
+    result = runner.invoke(
+        cli, args=["-u", USER, "-n", "host1", "-n", "host2"], input="pw2\n"
+    )
+
+    assert result.exit_code == 0
+    assert "Password for hostshost2" in result.output
+    assert "Password for hostshost1" not in result.output
+    assert "host1=pw1" in result.output
+    assert "host2=pw2" in result.output
+    assert keyring.get_password("hostshost2", USER) == "pw2"
+    assert keyring.get_keyring().writes == 1
+
+
+def test_bulk_resolution_with_password_argument(fernet_key):
+    """
+    Given an encrypted command with a multi-valued hostname option
+    When a password is passed as an argument
+    Then it is used and saved for every host
+    """
+    runner = CliRunner()
+    cli = make_hosts_cli({"encrypt": True})
+
+    result = runner.invoke(cli, args=["-u", USER, "-n", "h1", "-n", "h2", "-p", PW])
+
+    assert result.exit_code == 0
+    for host in ("h1", "h2"):
+        enc_pw = keyring.get_password("hosts" + host, USER).encode()
+        assert Fernet(fernet_key).decrypt(enc_pw).decode() == PW
+
+
+class ThreadRecordingBackEnd(KrTestBackEnd):
+    def __init__(self, thread_safe=True):
+        super().__init__(None)
+        self.thread_safe = thread_safe
+        self.threads = set()
+
+    def get_password(self, servicename, username):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.01)
+        return super().get_password(servicename, username)
+
+
+@pytest.mark.parametrize("thread_safe", [True, False])
+def test_fetch_many_thread_pool(thread_safe):
+    """
+    Given a keyring populated with some credentials
+    When fetching many credentials with several workers
+    Then results keep their order, errors become None and non
+    thread safe backends are called serially
+    """
+    backend = ThreadRecordingBackEnd(thread_safe)
+    keyring.set_keyring(backend)
+    for i in range(0, 8, 2):
+        keyring.set_password("svc{}".format(i), USER, "pw{}".format(i))
+    kr = click_keyring.KeyRing("svc", max_workers=4)
+
+    result = kr.fetch_many([("svc{}".format(i), USER) for i in range(8)])
+
+    assert result == ["pw0", None, "pw2", None, "pw4", None, "pw6", None]
+    if thread_safe:
+        assert threading.get_ident() not in backend.threads
+    else:
+        assert backend.threads == {threading.get_ident()}
+
+
+def test_enc_keyring_shares_cipher(fernet_key):
+    """
+    Given several encrypted keyring options using the same key
+    When their ciphers are used
+    Then a single cipher is shared until the key is invalidated
+    """
+    first = click_keyring.EncKeyRing("one", "username")
+    second = click_keyring.EncKeyRing("two", "username")
+    cipher = first.fernet
+    assert cipher is second.fernet
+    assert second.decrypt(first.encrypt(PW)) == PW
+
+    click_keyring.invalidate_cipher(fernet_key)
+    assert first.fernet is not cipher
+    assert first.fernet is second.fernet
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_enc_keyring_batch_crypto(fernet_key, monkeypatch, processes):
+    """
+    Given an EncKeyRing with a batch threshold smaller than the batch
+    When many passwords are encrypted and decrypted as a batch
+    Then the work is spread over a pool and results keep their order
+    """
+    kr = click_keyring.EncKeyRing("batch", "username")
+    monkeypatch.setattr(kr, "batch_threshold", 4)
+    monkeypatch.setattr(kr, "batch_processes", processes)
+    passwords = ["pw{}".format(i) for i in range(20)]
+
+    tokens = kr.encrypt_many(passwords, workers=3)
+    assert [kr.decrypt(token) for token in tokens] == passwords
+    assert kr.decrypt_many(tokens, workers=3) == passwords
+    assert kr.decrypt_many(tokens[:2]) == passwords[:2]
+
+
+def test_enc_keyring_save_many_encrypts(fernet_key):
+    """
+    Given an EncKeyRing
+    When passwords are saved as a batch
+    Then every stored value is encrypted
+    """
+    kr = click_keyring.EncKeyRing("batch", "username")
+    kr.save_many([("batch{}".format(i), USER, PW) for i in range(3)])
+    stored = [keyring.get_password("batch{}".format(i), USER) for i in range(3)]
+    assert kr.decrypt_many(stored) == [PW] * 3
+
+
+def test_enc_keyring_missing_key(monkeypatch):
+    """
+    Given no encryption key is configured
+    When an encrypted command is invoked
+    Then the command fails with a helpful error
+    """
+    monkeypatch.delenv("CLICK_KEYRING_KEY", raising=False)
+    runner = CliRunner()
+    cli = make_cli({"encrypt": True})
+    result = runner.invoke(cli, args=["-u", USER, "-p", PW])
+    assert result.exit_code != 0
+    assert "No encrypt key found" in result.output
+
+
+def test_enc_keyring_rotates_key_on_read(fernet_key, monkeypatch):
+    """
+    Given a password encrypted with an old key and a key list with a new primary key
+    When the command reads the password from keyring
+    Then the password is decrypted and re-encrypted with the primary key
+    """
+    new_key = Fernet.generate_key().decode()
+    cli = make_cli({"encrypt": True, "write": "on-change"})
+    keyring.set_password(cli.name, USER, Fernet(fernet_key).encrypt(PW.encode()).decode())
+    monkeypatch.setenv("CLICK_KEYRING_KEY", "{},{}".format(new_key, fernet_key))
+
+    runner = CliRunner()
+    result = runner.invoke(cli, args=["-u", USER])
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
+    enc_pw = keyring.get_password(cli.name, USER).encode()
+    assert Fernet(new_key).decrypt(enc_pw).decode() == PW
+
+    writes = keyring.get_keyring().writes
+    runner.invoke(cli, args=["-u", USER])
+    assert keyring.get_keyring().writes == writes
+
+
+def test_enc_keyring_rotation_writes_once(fernet_key, monkeypatch):
+    """
+    Given a password encrypted with an old key and the default "always" write policy
+    When the command reads the password from keyring
+    Then it is saved once, encrypted with the primary key
+    """
+    new_key = Fernet.generate_key().decode()
+    cli = make_cli({"encrypt": True})
+    keyring.set_password(cli.name, USER, Fernet(fernet_key).encrypt(PW.encode()).decode())
+    monkeypatch.setenv("CLICK_KEYRING_KEY", "{},{}".format(new_key, fernet_key))
+    keyring.get_keyring().writes = 0
+
+    result = CliRunner().invoke(cli, args=["-u", USER])
+    assert result.exit_code == 0
+    assert keyring.get_keyring().writes == 1
+    enc_pw = keyring.get_password(cli.name, USER).encode()
+    assert Fernet(new_key).decrypt(enc_pw).decode() == PW
+
+
+@pytest.mark.parametrize("args, env, default_map", [
+    (["-u", USER], {"CLI_PASSWORD": PW}, None),
+    (["-u", USER], {}, {"password": PW}),
+])
+def test_skip_sources_bypass_keyring(monkeypatch, args, env, default_map):
+    """
+    Given a command skipping the environment and default map sources
+    When the password comes from one of these sources
+    Then the password is used without reading or saving keyring
+    """
+    def fail(*args):
+        raise AssertionError("backend call")
+
+    monkeypatch.setattr(keyring, "get_password", fail)
+    monkeypatch.setattr(keyring, "set_password", fail)
+    runner = CliRunner()
+    cli = make_cli({
+        "envvar": "CLI_PASSWORD",
+        "skip_sources": ("ENVIRONMENT", "DEFAULT_MAP"),
+    })
+    result = runner.invoke(cli, args=args, env=env, default_map=default_map)
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
+
+
+def test_skip_sources_still_saves_command_line_value():
+    """
+    Given a command skipping the environment source
+    When the password is passed on the command line
+    Then the password is saved to keyring
+    """
+    runner = CliRunner()
+    cli = make_cli({"envvar": "CLI_PASSWORD", "skip_sources": ("ENVIRONMENT",)})
+    result = runner.invoke(cli, args=["-u", USER, "-p", PW])
+    assert result.exit_code == 0
+    assert keyring.get_password(cli.name, USER) == PW
+
+
+class CountingStore(click_keyring.MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.writes = 0
+
+    def get(self, service, username):
+        self.reads += 1
+        return super().get(service, username)
+
+    def set_many(self, items):
+        items = list(items)
+        self.writes += len(items)
+        super().set_many(items)
+
+
+def make_chain(store, share=True, multiple=False):
+    @click.group(chain=True)
+    def cli():
+        pass
+
+    for name in ("one", "two", "three"):
+        @cli.command(name=name)
+        @click_keyring.keyring_option(
+            "-p", "--password", prefix="shared", other_options=("hostname",), store=store, share=share
+        )
+        @click.option("-n", "--hostname", multiple=multiple)
+        @click.option("-u", "--username")
+        def cmd(username, hostname, password):
+            click.echo(format_result(username, str(password)))
+
+    return cli
+
+
+@pytest.mark.parametrize("share, reads, writes", [(True, 1, 1), (False, 3, 3)])
+def test_shared_credentials_across_chained_commands(share, reads, writes):
+    """
+    Given a chained group whose commands use the same service name and username
+    When several commands run in one invocation
+    Then the credential is read and saved once if sharing is enabled
+    """
+    store = CountingStore()
+    store.set("sharedhost1", USER, PW)
+    store.writes = 0
+    args = []
+    for name in ("one", "two", "three"):
+        args += [name, "-u", USER, "-n", "host1"]
+
+    result = CliRunner().invoke(make_chain(store, share), args=args)
+    assert result.exit_code == 0
+    assert result.output.count(format_result(USER, PW)) == 3
+    assert store.reads == reads
+    assert store.writes == writes
+
+
+def test_shared_credentials_bulk():
+    """
+    Given chained commands resolving passwords for several hosts
+    When the second command uses hosts already resolved by the first
+    Then only the new host is read from the store and saved
+    """
+    store = CountingStore()
+    for host in ("host1", "host2", "host3"):
+        store.set("shared" + host, USER, PW)
+    store.writes = 0
+    args = ["one", "-u", USER, "-n", "host1", "-n", "host2", "two", "-u", USER, "-n", "host2", "-n", "host3"]
+
+    result = CliRunner().invoke(make_chain(store, multiple=True), args=args)
+    assert result.exit_code == 0
+    assert store.reads == 3
+    assert store.writes == 3
+
+
+def test_shared_credentials_new_value_is_saved():
+    """
+    Given a credential resolved earlier in the invocation
+    When a later command is given a different password
+    Then the new password is used and saved
+    """
+    store = CountingStore()
+    store.set("sharedhost1", USER, PW)
+    store.writes = 0
+    args = ["one", "-u", USER, "-n", "host1", "two", "-u", USER, "-n", "host1", "-p", "newpw"]
+
+    result = CliRunner().invoke(make_chain(store), args=args)
+    assert result.exit_code == 0
+    assert format_result(USER, "newpw") in result.output
+    assert store.get("sharedhost1", USER) == "newpw"
+    assert store.writes == 2
+
+
+def test_get_cipher_builds_key_list_without_cached_keys():
+    """
+    Given an empty cipher registry
+    When the cipher for a list of keys is requested
+    Then it is built without waiting on the registry lock
+    """
+    click_keyring.invalidate_cipher()
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    cipher = click_keyring.get_cipher("{},{}".format(new_key, old_key))
+    token = Fernet(old_key).encrypt(PW.encode())
+    assert cipher.decrypt(token).decode() == PW
+    assert click_keyring.get_cipher(new_key) is click_keyring.get_cipher([new_key])
+
+
+@pytest.mark.parametrize("key", [" ", ",", " , "])
+def test_enc_keyring_blank_key(monkeypatch, key):
+    """
+    Given a CLICK_KEYRING_KEY envvar without any key in it
+    When an encrypted command is invoked
+    Then it fails with the missing key error
+    """
+    monkeypatch.setenv("CLICK_KEYRING_KEY", key)
+    cli = make_cli({"encrypt": True})
+    result = CliRunner().invoke(cli, args=["-u", USER, "-p", PW])
+    assert result.exit_code == 1
+    assert "No encrypt key found" in result.output
+    with pytest.raises(ValueError):
+        click_keyring.get_cipher(key)
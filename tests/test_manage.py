@@ -0,0 +1,86 @@
+import keyring
+from click.testing import CliRunner
+from click_keyring import SQLiteStore
+from click_keyring.cli import main
+
+
+USER = "testuser"
+
+
+def seed(path, count=20):
+    store = SQLiteStore(path)
+    store.set_many([("fleethost{:02d}".format(i), USER, "pw{}".format(i)) for i in range(count)])
+    store.set("other", "admin", "adminpw")
+    store.close()
+
+
+def test_list_by_prefix_and_pattern(tmp_path):
+    """
+    Given a SQLite store with credentials for several prefixes
+    When credentials are listed by prefix, username and pattern
+    Then only the matching services are printed
+    """
+    path = str(tmp_path / "creds.db")
+    seed(path)
+    runner = CliRunner()
+    store = "sqlite:" + path
+
+    result = runner.invoke(main, ["--store", store, "list", "fleet"])
+    assert result.exit_code == 0
+    assert len(result.output.splitlines()) == 20
+    assert "other" not in result.output
+
+    result = runner.invoke(main, ["--store", store, "list", "--match", "*host1?"])
+    assert result.output.splitlines() == ["fleethost{},{}".format(i, USER) for i in range(10, 20)]
+
+    result = runner.invoke(main, ["--store", store, "list", "-u", "admin"])
+    assert result.output.splitlines() == ["other,admin"]
+
+
+def test_export_import_purge(tmp_path, fernet_key):
+    """
+    Given a SQLite store with credentials
+    When credentials are exported, imported into a new store and purged
+    Then the new store receives them and the purge removes only the prefix
+    """
+    source = str(tmp_path / "source.db")
+    target = str(tmp_path / "target.db")
+    bundle = str(tmp_path / "bundle.bin")
+    seed(source)
+    runner = CliRunner()
+
+    result = runner.invoke(main, ["--store", "sqlite:" + source, "export", "fleet", "-o", bundle])
+    assert result.exit_code == 0
+    with open(bundle, "rb") as fh:
+        assert b"pw1" not in fh.read()
+
+    result = runner.invoke(main, ["--store", "sqlite:" + target, "-w", "4", "import", bundle])
+    assert result.exit_code == 0
+    assert SQLiteStore(target).get("fleethost07", USER) == "pw7"
+    assert SQLiteStore(target).get("other", "admin") is None
+
+    result = runner.invoke(main, ["--store", "sqlite:" + source, "purge", "fleet", "--yes"])
+    assert result.exit_code == 0
+    assert SQLiteStore(source).items() == [("other", "admin", "adminpw")]
+
+
+def test_keyring_store_requires_index(tmp_path, fernet_key):
+    """
+    Given the keyring store without a manifest, which cannot list credentials
+    When credentials are listed with and without an index file
+    Then an index file is required and used to find the credentials
+    """
+    keyring.set_password("fleet1", USER, "pw1")
+    keyring.set_password("fleet2", USER, "pw2")
+    index = tmp_path / "index.txt"
+    index.write_text("fleet1,{0}\nfleet2,{0}\nfleet1,{0}\n".format(USER))
+    runner = CliRunner()
+
+    result = runner.invoke(main, ["--no-manifest", "list"])
+    assert result.exit_code != 0
+    assert "--index" in result.output
+
+    result = runner.invoke(main, ["--no-manifest", "purge", "--index", str(index), "--yes"])
+    assert result.exit_code == 0
+    assert "Deleted 2 credentials" in result.output
+    assert keyring.get_keyring().store["fleet1"] == {}
@@ -0,0 +1,145 @@
+import click
+import keyring
+from click.testing import CliRunner
+from click_keyring import Manifest, keyring_option
+from click_keyring.cli import main
+
+USER = "testuser"
+PW = "testpw"
+
+
+def line_count(manifest):
+    with open(manifest.path) as fh:
+        return len(fh.readlines())
+
+
+def test_manifest_queries(tmp_path):
+    """
+    Given credentials recorded in a manifest
+    When it is queried by service prefix, username and option values
+    Then the matching entries are returned
+    """
+    manifest = Manifest(str(tmp_path / "manifest.jsonl"))
+    manifest.record_many([
+        ("fleeth1", "alice", {"hostname": "h1"}),
+        ("fleeth2", "alice", {"hostname": "h2"}),
+        ("fleeth2", "bob", {"hostname": "h2"}),
+        ("other", "alice", None),
+    ])
+
+    assert manifest.pairs("fleet") == [("fleeth1", "alice"), ("fleeth2", "alice"), ("fleeth2", "bob")]
+    assert manifest.pairs(username="alice") == [("fleeth1", "alice"), ("fleeth2", "alice"), ("other", "alice")]
+    assert manifest.pairs(options={"hostname": "h2"}) == [("fleeth2", "alice"), ("fleeth2", "bob")]
+    assert manifest.pairs("fleet", "bob", {"hostname": "h2"}) == [("fleeth2", "bob")]
+    assert manifest.entries("other")[0].options == {}
+
+    manifest.forget("fleeth2", "bob")
+    assert manifest.pairs(options={"hostname": "h2"}) == [("fleeth2", "alice")]
+    assert len(manifest) == 3
+
+
+def test_manifest_appends_only_changes_and_compacts(tmp_path):
+    """
+    Given two manifest instances on the same file
+    When credentials are recorded repeatedly
+    Then unchanged credentials are not appended, each instance sees the other's
+     records and the file is compacted once most lines are superseded
+    """
+    path = str(tmp_path / "manifest.jsonl")
+    first = Manifest(path, compact_min=10)
+    second = Manifest(path, compact_min=10)
+
+    first.record("svc", USER, {"hostname": "h1"})
+    first.record("svc", USER, {"hostname": "h1"})
+    first.record("svc", USER)
+    assert line_count(first) == 1
+
+    second.record("svc2", USER)
+    assert first.pairs() == [("svc", USER), ("svc2", USER)]
+
+    for i in range(10):
+        first.record("svc", USER, {"hostname": "h{}".format(i)})
+    assert line_count(first) < 10
+    assert second.entries("svc", options={"hostname": "h9"})[0].service == "svc"
+    assert len(second) == 2
+
+
+def test_keyring_option_records_manifest(tmp_path):
+    """
+    Given keyring options with a manifest
+    When passwords are saved for one and several hosts
+    Then the manifest records the service, username and other_options values
+    """
+    manifest = Manifest(str(tmp_path / "manifest.jsonl"))
+
+    @keyring_option("-p", "--password", prefix="fleet", other_options=("hostname",), manifest=manifest)
+    @click.option("-n", "--hostname", multiple=True)
+    @click.option("-u", "--username")
+    @click.command()
+    def bulk(username, hostname, password):
+        pass
+
+    @keyring_option("-p", "--password", prefix="single", other_options=("hostname",), manifest=manifest)
+    @click.option("-n", "--hostname")
+    @click.option("-u", "--username")
+    @click.command()
+    def single(username, hostname, password):
+        pass
+
+    runner = CliRunner()
+    assert runner.invoke(bulk, ["-u", USER, "-n", "h1", "-n", "h2", "-p", PW]).exit_code == 0
+    assert runner.invoke(single, ["-u", USER, "-n", "h3", "-p", PW]).exit_code == 0
+
+    assert manifest.pairs("fleet") == [("fleeth1", USER), ("fleeth2", USER)]
+    assert manifest.pairs(options={"hostname": "h3"}) == [("singleh3", USER)]
+
+
+def test_cli_uses_manifest_for_keyring_store(tmp_path):
+    """
+    Given credentials loaded into keyring with the management command
+    When they are listed and purged without an index file
+    Then the manifest is used to find them
+    """
+    source = tmp_path / "creds.csv"
+    source.write_text("hostname,username,password\nh1,u,p1\nh2,u,p2\n")
+    keyring.set_password("fleeth3", "u", "not recorded")
+    manifest = str(tmp_path / "manifest.jsonl")
+    runner = CliRunner()
+
+    result = runner.invoke(main, ["--manifest", manifest, "load", str(source), "--prefix", "fleet", "-o", "hostname"])
+    assert result.exit_code == 0
+    assert Manifest(manifest).pairs(options={"hostname": "h2"}) == [("fleeth2", "u")]
+    assert line_count(Manifest(manifest)) == 2
+
+    result = runner.invoke(main, ["--manifest", manifest, "list", "fleet"])
+    assert result.output.splitlines() == ["fleeth1,u", "fleeth2,u"]
+
+    result = runner.invoke(main, ["--manifest", manifest, "purge", "fleet", "--yes"])
+    assert result.exit_code == 0
+    assert keyring.get_keyring().store["fleeth1"] == {}
+    assert len(Manifest(manifest)) == 0
+
+
+def test_cli_purge_removes_file_cache_entries(tmp_path, fernet_key):
+    """
+    Given a keyring option with a file cache and a manifest that saved a password
+    When the credential is purged and the command runs again without a password
+    Then the purged password is neither returned nor saved back to keyring
+    """
+    @keyring_option("-p", "--password", file_cache=True, manifest=True)
+    @click.option("-u", "--username")
+    @click.command()
+    def app(username, password):
+        click.echo("pw={}".format(password))
+
+    runner = CliRunner()
+    assert runner.invoke(app, ["-u", USER, "-p", PW]).exit_code == 0
+    assert runner.invoke(app, ["-u", USER], input="\n").output.endswith("pw={}\n".format(PW))
+
+    result = runner.invoke(main, ["purge", "app", "--yes"])
+    assert result.exit_code == 0
+    assert keyring.get_keyring().store["app"] == {}
+
+    result = runner.invoke(app, ["-u", USER], input="other\n")
+    assert "pw=other" in result.output
+    assert keyring.get_password("app", USER) == "other"
@@ -0,0 +1,115 @@
+import threading
+import click
+import click_keyring
+from click.testing import CliRunner
+from click_keyring import MemoryStore, PrefetchCommand, PrefetchGroup, keyring_option
+
+USER = "testuser"
+PW = "testpw"
+
+
+class SlowStore(MemoryStore):
+    def __init__(self, block=False):
+        super().__init__()
+        self.threads = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def get(self, service, username):
+        self.threads.append(threading.get_ident())
+        self.started.set()
+        self.release.wait(5)
+        return super().get(service, username)
+
+
+def make_cli(store, hostname_callback=None):
+    @keyring_option("-p", "--password", prefix="pre", other_options=("hostname",), store=store, write="never")
+    @click.option("-n", "--hostname", default="host1", callback=hostname_callback)
+    @click.option("-u", "--username")
+    @click.command(cls=PrefetchCommand)
+    def cli(username, hostname, password):
+        click.echo("{}|{}|{}".format(username, hostname, password))
+
+    return cli
+
+
+def test_prefetch_overlaps_parsing():
+    """
+    Given a blocking store and an option callback processed before the password
+    When a PrefetchCommand is invoked
+    Then the store read starts on a background thread while the callback runs
+    """
+    store = SlowStore(block=True)
+    store.set("prehost1", USER, PW)
+    overlapped = []
+
+    def hostname_callback(ctx, param, value):
+        overlapped.append(store.started.wait(5))
+        store.release.set()
+        return value
+
+    result = CliRunner().invoke(make_cli(store, hostname_callback), ["-u", USER])
+
+    assert result.exit_code == 0
+    assert "{}|host1|{}".format(USER, PW) in result.output
+    assert overlapped == [True]
+    assert len(store.threads) == 1
+    assert store.threads[0] != threading.get_ident()
+
+
+def test_prefetch_mismatch_reads_store():
+    """
+    Given an option callback that changes the value used in the service name
+    When a PrefetchCommand is invoked
+    Then the prefetched value is not used and the resolved service is read
+    """
+    store = SlowStore()
+    store.set("prehost1", USER, PW)
+    cli = make_cli(store, hostname_callback=lambda ctx, param, value: value.lower())
+    result = CliRunner().invoke(cli, ["-u", USER, "-n", "HOST1"])
+
+    assert result.exit_code == 0
+    assert "{}|host1|{}".format(USER, PW) in result.output
+    assert len(store.threads) == 2
+
+
+def test_prefetch_skipped_when_password_given():
+    """
+    Given a password on the command line
+    When a PrefetchCommand is invoked
+    Then the store is never read
+    """
+    store = SlowStore()
+    result = CliRunner().invoke(make_cli(store), ["-u", USER, "-p", PW])
+
+    assert result.exit_code == 0
+    assert store.threads == []
+
+
+def test_prefetch_group_subcommands():
+    """
+    Given a PrefetchGroup
+    When a subcommand created with the group decorator is invoked
+    Then the subcommand prefetches its password
+    """
+    store = SlowStore()
+    store.set("prehost1", USER, PW)
+
+    @click.group(cls=PrefetchGroup)
+    def cli():
+        pass
+
+    @cli.command()
+    @keyring_option("-p", "--password", prefix="pre", other_options=("hostname",), store=store)
+    @click.option("-n", "--hostname", default="host1")
+    @click.option("-u", "--username")
+    def sub(username, hostname, password):
+        click.echo(password)
+
+    assert isinstance(sub, PrefetchCommand)
+    result = CliRunner().invoke(cli, ["sub", "-u", USER])
+    assert result.exit_code == 0
+    assert PW in result.output
+    assert store.threads[0] != threading.get_ident()
@@ -0,0 +1,61 @@
+import sys
+import subprocess
+
+
+HEAVY_MODULES = (
+    "keyring",
+    "cryptography",
+    "sqlite3",
+    "concurrent",
+    "logging",
+    "tempfile",
+    "mmap",
+)
+
+
+def imported_modules(statement):
+    """Run statement in a fresh interpreter and return the modules it imported"""
+    statement += "\nimport sys\nprint('\\n'.join(sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-c", statement],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return set(proc.stdout.splitlines())
+
+
+def is_heavy(module):
+    return module.split(".")[0] in HEAVY_MODULES
+
+
+def test_import_does_not_load_backends():
+    """
+    Given a fresh interpreter
+    When click_keyring is imported
+    Then keyring, cryptography and other slow to import modules are not imported
+    """
+    modules = imported_modules("import click_keyring")
+    assert "click_keyring" in modules
+    assert not [m for m in modules if is_heavy(m)]
+
+
+def test_decorating_commands_does_not_load_backends():
+    """
+    Given a fresh interpreter
+    When commands are decorated with plain and encrypted keyring options
+    Then keyring and cryptography are not imported
+    """
+    statement = "\n".join([
+        "import click, click_keyring",
+        "@click_keyring.keyring_option(encrypt=True)",
+        "@click.option('--username')",
+        "@click.command()",
+        "def enc(username, password): pass",
+        "@click_keyring.keyring_option()",
+        "@click.option('--username')",
+        "@click.command()",
+        "def plain(username, password): pass",
+    ])
+    modules = imported_modules(statement)
+    assert not [m for m in modules if is_heavy(m)]
@@ -0,0 +1,279 @@
+import time
+import threading
+import pytest
+import keyring
+import keyring.backend
+from click.testing import CliRunner
+from cryptography.fernet import Fernet
+from click_keyring import MemoryStore, SQLiteStore, KeyringStore, StoreError, StoreUnavailable, CircuitBreaker
+from .conftest import make_cli, format_result, KrTestBackEnd
+
+
+USER = "testuser"
+PW = "testpw"
+
+
+@pytest.fixture(name="store", params=["memory", "sqlite"])
+def store_fixture(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStore()
+    else:
+        store = SQLiteStore(str(tmp_path / "creds.db"))
+        yield store
+        store.close()
+
+
+def test_store_interface(store):
+    """
+    Given a credential store
+    When values are set, read in bulk and deleted
+    Then the store returns the expected values
+    """
+    store.set_many([("svc1", USER, "pw1"), ("svc2", USER, "pw2")])
+    store.set("svc1", USER, "pw1b")
+    assert store.get("svc1", USER) == "pw1b"
+    assert store.get_many([("svc1", USER), ("svc3", USER), ("svc2", USER)]) == [
+        "pw1b",
+        None,
+        "pw2",
+    ]
+    store.delete("svc1", USER)
+    store.delete("svc1", USER)
+    assert store.get("svc1", USER) is None
+
+
+def test_keyring_option_with_store(store, monkeypatch):
+    """
+    Given a command using a custom store
+    When the command saves and then reads a password
+    Then the store is used and keyring is never called
+    """
+    def fail(*args):
+        raise AssertionError("keyring call")
+
+    monkeypatch.setattr(keyring, "get_password", fail)
+    monkeypatch.setattr(keyring, "set_password", fail)
+    runner = CliRunner()
+    cli = make_cli({"store": store})
+
+    runner.invoke(cli, args=["-u", USER, "-p", PW])
+    result = runner.invoke(cli, args=["-u", USER])
+
+    assert result.exit_code == 0
+    assert format_result(USER, PW) in result.output
+    assert store.get(cli.name, USER) == PW
+
+
+def test_keyring_store_delete_missing():
+    """
+    Given the keyring store
+    When a missing credential is deleted
+    Then no error is raised
+    """
+    store = KeyringStore()
+    store.set("svc", USER, PW)
+    assert store.get("svc", USER) == PW
+    store.delete("svc", USER)
+    store.delete("svc", USER)
+
+
+def test_store_items_by_prefix(store):
+    """
+    Given a store with credentials for several prefixes
+    When items are listed for a prefix
+    Then only the matching credentials are returned in order
+    """
+    store.set_many([
+        ("fleethost2", USER, "pw2"),
+        ("fleethost1", USER, "pw1"),
+        ("other", USER, "pw3"),
+    ])
+    assert store.items("fleet") == [
+        ("fleethost1", USER, "pw1"),
+        ("fleethost2", USER, "pw2"),
+    ]
+    assert len(store.items()) == 3
+
+
+def test_sqlite_store_encrypts_and_uses_index(tmp_path, fernet_key):
+    """
+    Given an encrypting SQLite store
+    When credentials are saved and listed by prefix
+    Then values are encrypted at rest and the prefix query uses the index
+    """
+    path = str(tmp_path / "creds.db")
+    store = SQLiteStore(path, encrypt=True)
+    store.set_many([("fleet{}".format(i), USER, "pw{}".format(i)) for i in range(100)])
+    assert store.get("fleet42", USER) == "pw42"
+    assert store.items("fleet99") == [("fleet99", USER, "pw99")]
+
+    raw = store.conn.execute("SELECT value, updated_at FROM credentials").fetchone()
+    assert raw[0].startswith("gAAAA")
+    assert raw[1] is not None
+    plan = store.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM credentials WHERE service >= ? AND service < ?",
+        ("a", "b"),
+    ).fetchall()
+    assert "INDEX" in " ".join(str(row) for row in plan)
+    store.close()
+
+
+def test_sqlite_store_get_many_unreadable_values(tmp_path, fernet_key):
+    """
+    Given an encrypting SQLite store with a value encrypted with another key
+    When values are read one by one and in a batch
+    Then get raises StoreError and get_many returns default for that value only
+    """
+    store = SQLiteStore(str(tmp_path / "creds.db"), encrypt=True)
+    store.set("good", USER, "pw")
+    foreign = SQLiteStore(str(tmp_path / "creds.db"), encrypt=True, key=Fernet.generate_key())
+    foreign.set("bad", USER, "other")
+
+    with pytest.raises(StoreError):
+        store.get("bad", USER)
+    unreadable = object()
+    pairs = [("good", USER), ("bad", USER), ("missing", USER)]
+    assert store.get_many(pairs, default=unreadable) == ["pw", unreadable, None]
+    store.close()
+    foreign.close()
+
+
+def test_sqlite_store_upgrades_schema(tmp_path):
+    """
+    Given a database created without the updated_at column
+    When the store opens it
+    Then the column is added and existing credentials are kept
+    """
+    import sqlite3
+
+    path = str(tmp_path / "creds.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE credentials (service TEXT NOT NULL, username TEXT NOT NULL,"
+        " value TEXT NOT NULL, PRIMARY KEY (service, username))"
+    )
+    conn.execute("INSERT INTO credentials VALUES ('svc', ?, ?)", (USER, PW))
+    conn.commit()
+    conn.close()
+
+    store = SQLiteStore(path)
+    assert store.get("svc", USER) == PW
+    store.set("svc", USER, "newpw")
+    assert store.get("svc", USER) == "newpw"
+    store.close()
+
+
+class UnavailableBackEnd(keyring.backend.KeyringBackend):
+    priority = 1
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.calls = 0
+
+    def get_password(self, servicename, username):
+        self.calls += 1
+        time.sleep(self.delay)
+        raise keyring.errors.KeyringError("locked")
+
+    def set_password(self, servicename, username, password):
+        self.get_password(servicename, username)
+
+    def delete_password(self, servicename, username):
+        self.get_password(servicename, username)
+
+
+def test_keyring_store_deadline():
+    """
+    Given a keyring backend that hangs
+    When the store is read with a timeout
+    Then StoreUnavailable is raised once the timeout elapsed
+    """
+    keyring.set_keyring(UnavailableBackEnd(delay=2))
+    store = KeyringStore(use_agent=False, timeout=0.05)
+    start = time.monotonic()
+    with pytest.raises(StoreUnavailable):
+        store.get("svc", "user")
+    assert time.monotonic() - start < 1
+
+
+def test_keyring_store_deadline_serializes_non_thread_safe_backend():
+    """
+    Given a keyring backend that is not thread safe and hangs on the first call
+    When the store is read again before the abandoned call returned
+    Then StoreUnavailable is raised without calling the backend concurrently
+    """
+    class HangingBackEnd(KrTestBackEnd):
+        thread_safe = False
+
+        def __init__(self):
+            super().__init__(None)
+            self.release = threading.Event()
+            self.running = 0
+            self.overlaps = 0
+
+        def get_password(self, servicename, username):
+            self.running += 1
+            self.overlaps += self.running > 1
+            self.release.wait(5)
+            self.running -= 1
+            return super().get_password(servicename, username)
+
+    backend = HangingBackEnd()
+    keyring.set_keyring(backend)
+    backend.set_password("svc", "user", "pw")
+    store = KeyringStore(use_agent=False, timeout=0.05)
+    try:
+        with pytest.raises(StoreUnavailable):
+            store.get("svc", "user")
+        with pytest.raises(StoreUnavailable):
+            store.get("svc", "user")
+    finally:
+        backend.release.set()
+    assert KeyringStore(use_agent=False, timeout=5).get("svc", "user") == "pw"
+    assert backend.overlaps == 0
+
+
+def test_circuit_breaker_skips_failing_backend(tmp_path):
+    """
+    Given a failing keyring backend and a circuit breaker shared through a file
+    When the failure threshold is reached
+    Then other stores using the same breaker file skip the backend until the cool-down passed
+    """
+    clock = [1000.0]
+    path = str(tmp_path / "breaker")
+    backend = UnavailableBackEnd()
+    keyring.set_keyring(backend)
+    store = KeyringStore(use_agent=False, breaker=CircuitBreaker(path, failures=2, clock=lambda: clock[0]))
+    for _ in range(2):
+        with pytest.raises(StoreError):
+            store.get("svc", "user")
+    assert backend.calls == 2
+
+    other = KeyringStore(use_agent=False, breaker=CircuitBreaker(path, cooldown=60, clock=lambda: clock[0]))
+    with pytest.raises(StoreUnavailable):
+        other.get("svc", "user")
+    assert backend.calls == 2
+
+    clock[0] += 60
+    keyring.set_keyring(KrTestBackEnd(None))
+    keyring.set_password("svc", "user", "pw")
+    assert other.get("svc", "user") == "pw"
+    assert CircuitBreaker(path).open_until is None
+
+
+def test_unavailable_store_returns_prompted_password():
+    """
+    Given a keyring option whose backend is skipped by an open circuit breaker
+    When the command is invoked
+    Then the password is prompted for and the failed save does not abort the command
+    """
+    class OpenBreaker(CircuitBreaker):
+        def allow(self):
+            return False
+
+    store = KeyringStore(use_agent=False, breaker=OpenBreaker())
+    runner = CliRunner()
+    result = runner.invoke(make_cli({"store": store}), args=["-u", "testuser"], input="testpw\n")
+    assert result.exit_code == 0
+    assert format_result("testuser", "testpw", "other_default") in result.output